@@ -1,20 +1,35 @@
 import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
 from src.infrastructure.filesystem.watcher import FileWatcher
 from src.core.events import event_broker
 from src.services import start_all_services
 from src.infrastructure.database.engine import init_db
 from src.application.processor import EventProcessor
+from src.config.settings import settings
+from src.utils.logger import logger
 
 class SortifyController:
     def __init__(self):
         self.watcher = FileWatcher()
         self.services = []
         self.ui = None
-        self.processing_queue = queue.Queue()
-        self.processor = EventProcessor(self.processing_queue)
+        # SimpleQueue's C-level lock is cheaper than Queue; the bound lives on the in-flight set
+        self.processing_queue = queue.SimpleQueue()
+        self.max_pending = 1024
+        # Paths queued or being processed, so event bursts don't enqueue the same file twice
+        self._inflight = set()
+        self._inflight_lock = threading.Lock()
+        # Coalescing window: a path is enqueued once it has been quiet for debounce_seconds
+        self.debounce_seconds = 0.3
+        self._pending: Dict[Path, float] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        self.processor = EventProcessor(self.processing_queue, on_done=self._release_path)
 
     def start(self, progress_callback=None):
-        import threading
         init_db()
         event_broker.FILE_CREATED.connect(self._on_file_created)
         event_broker.FILE_CLASSIFIED.connect(self._notify_ui_classification)
@@ -26,6 +41,9 @@ class SortifyController:
                 if self.ui:
                     self.ui.notify("Startup", "Initializing AI Engine...")
 
+                from src.infrastructure.embeddings.sentence_transformer import model_manager
+                model_manager.get_embedding_model().warm_up()
+
                 from src.services.atlas import atlas
                 if progress_callback:
                     atlas.set_progress_callback(progress_callback)
@@ -63,7 +81,16 @@ class SortifyController:
 
     def stop(self):
         self.watcher.stop()
+        with self._pending_lock:
+            if self._flush_timer:
+                self._flush_timer.cancel()
+        # Blocks until in-flight files are done, so nothing touches Atlas after the flush
         self.processor.stop()
+        # Stop the debounced Atlas writer and persist whatever it was still holding
+        from src.services.atlas import atlas
+        atlas.close()
+        from src.services.executor import executor
+        executor.close_log()
         
     def pause(self):
         self.watcher.pause()
@@ -74,11 +101,49 @@ class SortifyController:
         self.processor.resume()
 
     def _on_file_created(self, sender, path=None, **kwargs):
-        if path:
+        # Ignore patterns are already applied by the watcher and EventProcessor._is_ignored
+        if not path:
+            return
+        with self._pending_lock:
+            self._pending[path] = time.monotonic()
+            if self._flush_timer is None:
+                self._schedule_flush()
+
+    def _schedule_flush(self):
+        # Caller holds _pending_lock
+        self._flush_timer = threading.Timer(self.debounce_seconds, self._flush_pending)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def _flush_pending(self):
+        now = time.monotonic()
+        with self._pending_lock:
+            ready = [p for p, t in self._pending.items() if now - t >= self.debounce_seconds]
+            for p in ready:
+                del self._pending[p]
+            self._flush_timer = None
+            if self._pending:
+                self._schedule_flush()
+        for path in ready:
+            self._enqueue(path)
+
+    def _enqueue(self, path: Path):
+        with self._inflight_lock:
+            if path in self._inflight:
+                logger.debug(f"Already queued, skipping duplicate event: {path.name}")
+                return
+            if len(self._inflight) >= self.max_pending:
+                logger.warning(f"Processing queue full, dropping: {path.name}")
+                return
+            self._inflight.add(path)
             self.processing_queue.put(path)
         if self.ui:
             self.ui.notify("File Detected", f"{path.name}")
 
+    def _release_path(self, path):
+        with self._inflight_lock:
+            self._inflight.discard(path)
+
     def _notify_ui_classification(self, sender, path=None, category=None, **kwargs):
         if self.ui:
             self.ui.notify("Classified", f"{path.name} -> {category}")
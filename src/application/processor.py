@@ -1,28 +1,54 @@
+import functools
+import logging
+import os
 import queue
 import threading
-import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Optional
 from src.config.settings import settings
+from src.core.events import event_broker
 from src.utils.logger import logger
 from src.i18n.strings import Strings
 from src.infrastructure.filesystem.scanner import scanner
 from src.infrastructure.extractors.text import Ingestor
 from src.core.classification.keywords import KeywordExtractor
+from src.core.classification.classifier import classifier
+from src.infrastructure.llm.nli import nli_classifier
+from src.services.executor import executor
+from src.services.pipeline import pipeline
+from src.utils.system import check_battery_ok, resource_guard
 
 class EventProcessor(threading.Thread):
-    def __init__(self, event_queue: queue.Queue):
+    def __init__(self, event_queue: queue.SimpleQueue, on_done: Optional[Callable[[Path], None]] = None):
         super().__init__()
         self.queue = event_queue
-        self.running = True
+        self.on_done = on_done
+        self._stop_evt = threading.Event()
         self.paused = False
+        self.poll_interval = 0.05 # Pause/stop/new work are noticed within 50 ms
+        
+        # IGNORE_PATTERNS split once into plain suffix/prefix tuples for str.endswith/startswith
+        self._ignore_prefixes = tuple(p.rstrip("*") for p in settings.IGNORE_PATTERNS if p.endswith("*"))
+        self._ignore_suffixes = tuple(p.lstrip("*") for p in settings.IGNORE_PATTERNS if not p.endswith("*"))
         self.ingestor = Ingestor()
         self.extractor = KeywordExtractor()
         
+        # Files are processed concurrently; the semaphore keeps at most one file per
+        # worker in flight so the controller's pending cap still applies backpressure.
+        self.max_workers = min(4, os.cpu_count() or 1)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sortify-worker")
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        
         from src.services.atlas import atlas
         self.atlas = atlas
         self.atlas.initialize() 
-        from src.services.pipeline import ProcessingPipeline
-        self.pipeline = ProcessingPipeline()
+        # Text-only folder lookups repeat across files ("Documents", "Code"); drop them when the index changes
+        self._folder_cache = functools.lru_cache(maxsize=512)(self._atlas_lookup)
+        event_broker.ATLAS_UPDATED.connect(self._on_atlas_updated)
+        self.pipeline = pipeline
+        # Same instance the NLI voter uses, so there is one session and one reaper
+        self.fallback = nli_classifier
 
     def pause(self):
         self.paused = True
@@ -33,63 +59,103 @@ class EventProcessor(threading.Thread):
         logger.info(Strings.PROCESSOR_RESUMED.value)
 
     def stop(self):
-        self.running = False
+        """Stops the loop and waits for in-flight files, so callers can flush state afterwards."""
+        self._stop_evt.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+        else:
+            self._pool.shutdown(wait=True, cancel_futures=True)
 
     def run(self):
         logger.info(Strings.PROCESSOR_STARTED.value)
-        from src.utils.system import resource_guard
         
-        while self.running:
-            if self.paused:
-                time.sleep(1)
+        while not self._stop_evt.is_set():
+            # Idle/paused: cheap poll that stop() can interrupt immediately
+            if self.paused or self.queue.empty():
+                self._stop_evt.wait(self.poll_interval)
                 continue
             
             if not resource_guard.check():
-                time.sleep(1)
+                self._stop_evt.wait(1.0)
                 continue
                 
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue
+
             try:
-                file_path = self.queue.get(timeout=1.0)
-                self.process_file(file_path)
-                self.queue.task_done()
+                file_path = self.queue.get_nowait()
             except queue.Empty:
+                self._slots.release()
                 continue
+
+            if self._is_ignored(file_path):
+                logger.debug(f"Ignoring transient file: {file_path.name}")
+                self._slots.release()
+                if self.on_done:
+                    self.on_done(file_path)
+                continue
+
+            try:
+                future = self._pool.submit(self.process_file, file_path)
+                future.add_done_callback(self._on_task_done)
             except Exception as e:
+                self._slots.release()
                 logger.error(f"Processor loop error: {e}")
 
+        # Drop queued work but let running files finish their move/cluster update
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _atlas_lookup(self, text: str, threshold: float):
+        return self.atlas.find_best_folder(fallback_text=text, threshold=threshold)
+
+    def _on_atlas_updated(self, sender, **kwargs):
+        self._folder_cache.cache_clear()
+
+    def _find_folder(self, file_embedding=None, text: str = None, threshold: float = 0.55):
+        """Atlas lookup; memoized when matching on text alone (embeddings are unique per file)."""
+        if file_embedding is None:
+            return self._folder_cache(text, threshold)
+        return self.atlas.find_best_folder(file_embedding=file_embedding, fallback_text=text, threshold=threshold)
+
+    def _is_ignored(self, file_path: Path) -> bool:
+        name = file_path.name
+        return name.startswith(self._ignore_prefixes) or name.endswith(self._ignore_suffixes)
+
+    def _on_task_done(self, future: Future):
+        self._slots.release()
+
     def process_file(self, file_path: Path):
         """
         Main logic for processing a file.
         """
         try:
-            if not file_path.exists():
+            try:
+                st = os.stat(file_path)
+            except FileNotFoundError:
                 logger.warning(f"File not found (moved/deleted?): {file_path}")
                 return
             
             # Check if this file was recently moved by us (prevent infinite loop)
-            from src.services.executor import executor
             if executor.is_recently_moved(file_path):
-                logger.debug(f"Skipping recently moved file: {file_path.name}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Skipping recently moved file: {file_path.name}")
                 return
             
             logger.info(f"Processing: {file_path.name}")
 
             # Checks (Size, Privacy)
             # Battery Check
-            from src.utils.system import check_battery_ok
             if not check_battery_ok():
                 return
             
             # Size Limit Check (200MB max)
-            file_size_mb = file_path.stat().st_size / (1024 * 1024)
+            file_size_mb = st.st_size / (1024 * 1024)
             if file_size_mb > 200:
                 logger.warning(f"File {file_path.name} ({file_size_mb:.2f} MB) exceeds size limit. Using basic extension sort.")
-                from src.core.classification.classifier import classifier
                 category = classifier.classify_by_extension(file_path)
                 result = {"category": category, "method": "size_fallback"}
             else:
                  # Pipeline Execution
-                from src.services.pipeline import pipeline
                 result = pipeline.process_file(file_path)
 
             category = result.get("category", "Unknown")
@@ -114,24 +180,23 @@ class EventProcessor(threading.Thread):
                 
                 file_embedding = result.get("embedding")
                 
-                target_folder, confidence = self.atlas.find_best_folder(
+                target_folder, confidence = self._find_folder(
                     file_embedding=file_embedding,
-                    fallback_text=search_query,
+                    text=search_query,
                     threshold=0.55
                 )
                 
                 if not target_folder and search_query != category:
-                    target_folder, confidence = self.atlas.find_best_folder(
+                    target_folder, confidence = self._find_folder(
                         file_embedding=file_embedding,
-                        fallback_text=category,
+                        text=category,
                         threshold=0.55
                     )
                 
                 if target_folder:
                      logger.info(f"Atlas: Route to global folder {target_folder.name}")
                 else:
-                    from src.infrastructure.llm.nli import FallbackHandler
-                    agent = FallbackHandler()
+                    agent = self.fallback
                     
                     # Ask NLI for a best fit category
                     text_snippet = " ".join(file_keywords) if file_keywords else file_path.stem
@@ -144,8 +209,8 @@ class EventProcessor(threading.Thread):
                         suggested_name = suggested_name.strip().strip("/\\").replace("/", "_").replace("\\", "_")
                     
                     if suggested_name and suggested_name != "Unknown":
-                        existing_match, match_conf = self.atlas.find_best_folder(
-                            fallback_text=str(suggested_name), 
+                        existing_match, match_conf = self._find_folder(
+                            text=str(suggested_name), 
                             threshold=0.75
                         )
                         
@@ -161,7 +226,6 @@ class EventProcessor(threading.Thread):
                         target_folder = watch_root / category
 
             # Decision & Action
-            from src.services.executor import executor
             if executor.safe_move(file_path, target_folder):
                 if hasattr(self, 'ui') and self.ui:
                     if "_Needs_Review" in str(target_folder):
@@ -175,7 +239,6 @@ class EventProcessor(threading.Thread):
                     keywords = result.get("keywords", [])
                     if keywords:
                         try:
-                            from src.core.classification.classifier import classifier
                             classifier.learn(keywords, category)
                         except Exception as e:
                              # Log but don't crash processing loop
@@ -185,3 +248,6 @@ class EventProcessor(threading.Thread):
 
         except Exception as e:
             logger.error(f"Error processing {file_path.name}: {e}")
+        finally:
+            if self.on_done:
+                self.on_done(file_path)
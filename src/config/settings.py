@@ -2,8 +2,27 @@ from pydantic_settings import BaseSettings
 from pydantic import Field
 from typing import List, Optional, Dict
 from pathlib import Path
+import json
 import os
 
+# orjson is optional; it's a faster drop-in for the config read/write path
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _read_json(path: Path):
+    data = path.read_bytes()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _write_json(path: Path, data, default=None):
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2, default=default))
+    else:
+        path.write_text(json.dumps(data, indent=4, default=default))
+
 class Settings(BaseSettings):
     # Core Settings
     APP_NAME: str = "Sortify"
@@ -47,19 +66,17 @@ class Settings(BaseSettings):
         
         if config_path.exists():
             try:
-                import json
-                with open(config_path, "r") as f:
-                    data = json.load(f)
-                    # Convert list of strings back to Path objects where needed
-                    if "WATCH_DIRECTORIES" in data:
-                        data["WATCH_DIRECTORIES"] = [Path(p) for p in data["WATCH_DIRECTORIES"]]
-                    if "CATEGORY_MAP" in data:
-                        data["CATEGORY_MAP"] = {k: Path(v) for k, v in data["CATEGORY_MAP"].items()}
-                    if "LOG_FILE" in data:
-                        data["LOG_FILE"] = Path(data["LOG_FILE"])
-                    if "DB_FILE" in data:
-                        data["DB_FILE"] = Path(data["DB_FILE"])
-                    start_defaults.update(data)
+                data = _read_json(config_path)
+                # Convert list of strings back to Path objects where needed
+                if "WATCH_DIRECTORIES" in data:
+                    data["WATCH_DIRECTORIES"] = [Path(p) for p in data["WATCH_DIRECTORIES"]]
+                if "CATEGORY_MAP" in data:
+                    data["CATEGORY_MAP"] = {k: Path(v) for k, v in data["CATEGORY_MAP"].items()}
+                if "LOG_FILE" in data:
+                    data["LOG_FILE"] = Path(data["LOG_FILE"])
+                if "DB_FILE" in data:
+                    data["DB_FILE"] = Path(data["DB_FILE"])
+                start_defaults.update(data)
             except Exception as e:
                 print(f"Warning: Failed to load config.json: {e}")
         
@@ -85,21 +102,17 @@ def save_settings(new_settings: dict):
         return str(obj)
 
     try:
-        import json
-        
         # Merge with existing file if possible to avoid losing keys we don't know about
         current_data = {}
         if config_path.exists():
              try:
-                 with open(config_path, "r") as f:
-                     current_data = json.load(f)
+                 current_data = _read_json(config_path)
              except Exception:
                  pass
 
         current_data.update(new_settings)
 
-        with open(config_path, "w") as f:
-            json.dump(current_data, f, indent=4, default=default_serializer)
+        _write_json(config_path, current_data, default=default_serializer)
             
     except Exception as e:
         print(f"Failed to save settings: {e}")
@@ -1,10 +1,20 @@
+import hashlib
+import threading
+import numpy as np
 from typing import List, Dict, Optional, Tuple
 from pathlib import Path
-from sentence_transformers import util
 from src.config.settings import settings
 from src.utils.logger import logger
 from src.infrastructure.embeddings.sentence_transformer import model_manager
 
+# Single C-level pass to drop punctuation when comparing keywords to folder names
+_STRIP_TBL = str.maketrans("", "", ".,-_")
+
+def _quantize_rows(mat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization; returns (int8 matrix, per-row float32 scale)."""
+    scale = np.maximum(np.abs(mat).max(axis=1, keepdims=True), 1e-12) / 127.0
+    return np.round(mat / scale).astype(np.int8), scale.flatten().astype(np.float32)
+
 class Classifier:
     def __init__(self):
         self.model = None
@@ -33,35 +43,90 @@ class Classifier:
             "College": ["syllabus", "assignment", "lecture", "notes", "exam"],
             "Personal": ["photo", "family", "vacation"],
         }
+        self._ext_to_cat = {e: cat for cat, exts in self.extensions.items() for e in exts}
         self.category_embeddings = {}
+        # Stacked, L2-normalized (K, D) category_embeddings for a single GEMV when scoring.
+        # float32 like the memory ring: NumPy's int8 matmul has no BLAS path, so int8 is
+        # only used for the on-disk cache and dequantized on load
+        self._cat_matrix: Optional[np.ndarray] = None
+        self._cat_names: List[str] = []
+        # Normalized embeddings of find_best_match candidates that aren't categories
+        self._match_embeddings: Dict[str, np.ndarray] = {}
+        self._candidates_key: Tuple[str, ...] = ()
+        self._candidates_lookup: Dict[str, str] = {}
         self._initialized = False
+        # Serializes initialization, dynamic-category growth and learning across processor workers
+        self._lock = threading.RLock()
 
     def _ensure_initialized(self):
-        if not self._initialized:
+        if self._initialized:
+            return
+        with self._lock:
+            if self._initialized:
+                return
             self.model = model_manager.get_embedding_model()
+            cache_path = self._embedding_cache_path()
+            if cache_path.exists():
+                try:
+                    data = np.load(cache_path)
+                    matrix = data["matrix_i8"].astype(np.float32) * data["scale"][:, None]
+                    self._append_categories([str(n) for n in data["names"]], matrix)
+                    self._initialized = True
+                    logger.info("Loaded category embeddings from cache.")
+                    return
+                except Exception as e:
+                    logger.warning(f"Failed to load category embedding cache: {e}")
+                    self.category_embeddings = {}
+                    self._cat_matrix = None
+                    self._cat_names = []
+
             logger.info("Computing category embeddings...")
-            for cat, description in self.categories.items():
-                self.category_embeddings[cat] = self.model.encode(description)
+            names = list(self.categories)
+            embeddings = self.model.encode(list(self.categories.values()), batch_size=32, convert_to_numpy=True)
+            self._append_categories(names, embeddings)
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                matrix_i8, scale = _quantize_rows(self._cat_matrix)
+                np.savez(cache_path, matrix_i8=matrix_i8, scale=scale, names=np.array(self._cat_names))
+            except Exception as e:
+                logger.warning(f"Failed to save category embedding cache: {e}")
             self._initialized = True
+
+    def _embedding_cache_path(self) -> Path:
+        """Cache file keyed by the static category descriptions and the embedding model."""
+        key = hashlib.sha1(
+            repr(sorted(self.categories.items())).encode() + settings.LOCAL_MODEL_NAME.encode()
+        ).hexdigest()
+        return Path.home() / ".sortify" / f"cat_emb_{key}.npz"
+
+    def _append_categories(self, names: List[str], embeddings: np.ndarray):
+        """Register category embeddings in both the lookup dict and the scoring matrix."""
+        rows = np.asarray(embeddings, dtype=np.float32).reshape(len(names), -1)
+        rows = rows / (np.linalg.norm(rows, axis=1, keepdims=True) + 1e-8)
+        for name, row in zip(names, rows):
+            self.category_embeddings[name] = row
+        # Names grow before the matrix so lock-free readers never index past them
+        self._cat_names.extend(names)
+        self._cat_matrix = rows if self._cat_matrix is None else np.vstack([self._cat_matrix, rows])
             
     def update_dynamic_categories(self, discovered_map: Dict[str, Path]):
         self._ensure_initialized()
         
-        for category, path in discovered_map.items():
-            if category not in self.category_embeddings:
-                desc = category.replace("_", " ").replace("-", " ")
-                logger.debug(f"Embedding dynamic category: {category}")
-                try:
-                    self.category_embeddings[category] = self.model.encode(desc)
-                except Exception as e:
-                    logger.warning(f"Failed to embed {category}: {e}")
+        with self._lock:
+            new_categories = [c for c in discovered_map if c not in self.category_embeddings]
+            if not new_categories:
+                return
+
+            logger.debug(f"Embedding {len(new_categories)} dynamic categories")
+            descs = [c.replace("_", " ").replace("-", " ") for c in new_categories]
+            try:
+                embeddings = self.model.encode(descs, batch_size=32, convert_to_numpy=True)
+                self._append_categories(new_categories, embeddings)
+            except Exception as e:
+                logger.warning(f"Failed to embed dynamic categories: {e}")
 
     def classify_by_extension(self, file_path: Path) -> str:
-        ext = file_path.suffix.lower().lstrip(".")
-        for cat, exts in self.extensions.items():
-            if ext in exts:
-                return cat
-        return "Unknown"
+        return self._ext_to_cat.get(file_path.suffix.lower().lstrip("."), "Unknown")
 
     def classify_by_keywords(self, keywords: List[str]) -> Tuple[str, float]:
         if not keywords:
@@ -77,14 +142,11 @@ class Classifier:
             if mem_cat:
                 return mem_cat, mem_score
 
-            best_cat = "Unknown"
-            best_score = -1.0
-            
-            for cat, cat_embedding in self.category_embeddings.items():
-                score = util.cos_sim(query_embedding, cat_embedding).item()
-                if score > best_score:
-                    best_score = score
-                    best_cat = cat
+            q = np.asarray(query_embedding, dtype=np.float32).flatten()
+            q /= np.linalg.norm(q) + 1e-8
+            scores = self._cat_matrix @ q
+            idx = int(scores.argmax())
+            best_cat, best_score = self._cat_names[idx], float(scores[idx])
             
             logger.debug(f"Best match for '{query_text}': {best_cat} (Score: {best_score:.2f})")
             if best_score < settings.CLASSIFICATION_THRESHOLD:
@@ -97,6 +159,14 @@ class Classifier:
             logger.error(f"Vector classification failed: {e}")
             return "Unknown", 0.0
 
+    def _normalized_candidates(self, candidates: List[str]) -> Dict[str, str]:
+        """{normalized: original} lookup, memoized for the common case of an unchanged candidate list."""
+        key = tuple(candidates)
+        if key != self._candidates_key:
+            self._candidates_lookup = {c.translate(_STRIP_TBL).lower(): c for c in candidates}
+            self._candidates_key = key
+        return self._candidates_lookup
+
     def find_best_match(self, query: str, candidates: List[str], keywords: List[str] = None) -> Optional[str]:
         """
         Hybrid Ensemble Matching:
@@ -107,31 +177,29 @@ class Classifier:
             return None
 
         if keywords:
-            normalized_candidates = {c.lower(): c for c in candidates}
+            normalized_candidates = self._normalized_candidates(candidates)
             for kw in keywords:
-                kw_clean = kw.lower().strip(".,-_")
+                kw_clean = kw.translate(_STRIP_TBL).lower()
                 if kw_clean in normalized_candidates:
                     logger.info(f"Ensemble: Direct Keyword Match '{kw}' -> '{normalized_candidates[kw_clean]}'")
                     return normalized_candidates[kw_clean]
 
         try:
             self._ensure_initialized()
-            query_embedding = self.model.encode(query)
-            
-            best_candidate = None
-            best_score = -1.0
+            query_embedding = self.model.encode(query)[0]
+            query_embedding = query_embedding / (np.linalg.norm(query_embedding) + 1e-8)
             
-            for cand in candidates:
-                if cand in self.category_embeddings:
-                    cand_embedding = self.category_embeddings[cand]
-                else:
-                    cand_embedding = self.model.encode(cand.replace("_", " "))
-                    
-                score = util.cos_sim(query_embedding, cand_embedding).item()
-                
-                if score > best_score:
-                    best_score = score
-                    best_candidate = cand
+            # Encode all unseen candidates in one batch; remember them for the next call
+            missing = [c for c in candidates if c not in self.category_embeddings and c not in self._match_embeddings]
+            if missing:
+                new_embs = self.model.encode([c.replace("_", " ") for c in missing], batch_size=32, convert_to_numpy=True)
+                new_embs = new_embs / (np.linalg.norm(new_embs, axis=1, keepdims=True) + 1e-8)
+                self._match_embeddings.update(zip(missing, new_embs.astype(np.float32)))
+
+            mat = np.vstack([self.category_embeddings.get(c, self._match_embeddings.get(c)) for c in candidates])
+            scores = mat @ query_embedding
+            idx = int(scores.argmax())
+            best_candidate, best_score = candidates[idx], float(scores[idx])
             
             logger.debug(f"Ensemble: Semantic Match '{query}' -> '{best_candidate}' (Score: {best_score:.2f})")
             
@@ -153,7 +221,8 @@ class Classifier:
             text = " ".join(keywords)
             embedding = self.model.encode(text)
             from src.services.memory import memory
-            memory.learn(text, category, embedding)
+            with self._lock:
+                memory.learn(text, category, embedding)
         except Exception as e:
             logger.error(f"Failed to learn: {e}")
 
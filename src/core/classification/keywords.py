@@ -12,55 +12,61 @@ STOPWORDS = {
     "has", "have", "had", "not", "no", "but", "if", "then", "so", "we", "you", "your"
 }
 
+# Tokens are runs of 3+ alphanumerics; stopwords are rejected inside the regex so the
+# scan loop never sees them. Lookarounds (not \b) keep "_" a separator as before.
+_STOP_PATTERN = "|".join(sorted((re.escape(w) for w in STOPWORDS), key=len, reverse=True))
+_TOKEN_RE = re.compile(rf"(?<![A-Za-z0-9])(?!(?:{_STOP_PATTERN})(?![A-Za-z0-9]))[A-Za-z0-9]{{3,}}")
+MAX_CANDIDATES = 80
+MAX_DOC_WORDS = 120
+
 
 class KeywordExtractor:
     def __init__(self):
         # Reuse the ONNX embedder directly to avoid loading a torch SentenceTransformer
         self._embedder = model_manager.get_embedding_model()
 
-    def _tokenize(self, text: str) -> List[str]:
-        return [w for w in re.findall(r"[A-Za-z0-9]{3,}", text.lower()) if w not in STOPWORDS]
-
-    def _candidates(self, words: List[str]) -> List[str]:
-        # Build unigrams + bigrams, keep ordering while deduping
-        unigrams = words
-        bigrams = [" ".join(pair) for pair in zip(words, words[1:])]
-        ordered = []
-        seen = set()
-        for token in unigrams + bigrams:
-            if token not in seen:
-                ordered.append(token)
-                seen.add(token)
-        return ordered
-
     def extract(self, text: str, top_n: int = 5) -> List[str]:
         """Memory-lean keyword extraction using cosine to the document embedding."""
         if not text or len(text.strip()) < 5:
             return []
 
         try:
-            words = self._tokenize(text)
+            # Single pass: collect doc words and deduped unigrams + inline bigrams
+            words = []
+            seen = {}
+            prev = None
+            for m in _TOKEN_RE.finditer(text.lower()):
+                w = m.group()
+                if len(words) < MAX_DOC_WORDS:
+                    words.append(w)
+                if len(seen) < MAX_CANDIDATES:
+                    seen.setdefault(w, None)
+                    if prev is not None:
+                        seen.setdefault(prev + " " + w, None)
+                elif len(words) >= MAX_DOC_WORDS:
+                    break
+                prev = w
+
             if not words:
                 return []
 
-            candidates = self._candidates(words)
             # Cap to keep batch small and RAM bounded
-            candidates = candidates[:80]
-
-            doc_text = " ".join(words[:120])
-            doc_emb = np.array(self._embedder.encode(doc_text), dtype=np.float32).flatten()
-            cand_embs = np.array(self._embedder.encode(candidates, batch_size=16), dtype=np.float32)
+            candidates = list(seen)[:MAX_CANDIDATES]
 
-            if cand_embs.ndim == 1:
-                cand_embs = cand_embs.reshape(1, -1)
+            doc_text = " ".join(words)
+            # One encode call for document + candidates, split afterwards
+            embs = self._embedder.encode([doc_text] + candidates, batch_size=32, convert_to_numpy=True).astype(np.float32)
+            doc_emb = embs[0]
+            cand_embs = embs[1:]
 
-            # Cosine similarity doc vs candidates
-            doc_norm = np.linalg.norm(doc_emb) + 1e-8
-            cand_norm = np.linalg.norm(cand_embs, axis=1) + 1e-8
-            scores = (cand_embs @ doc_emb) / (cand_norm * doc_norm)
+            # Cosine similarity doc vs candidates (normalize in place, then one GEMV)
+            cand_embs /= np.linalg.norm(cand_embs, axis=1, keepdims=True) + 1e-8
+            doc_emb /= np.linalg.norm(doc_emb) + 1e-8
+            scores = cand_embs @ doc_emb
 
-            # Pick top_n with highest scores
-            top_indices = np.argsort(-scores)[:top_n]
+            # Pick top_n with highest scores without a full sort
+            top_indices = np.argpartition(-scores, min(top_n, len(scores) - 1))[:top_n]
+            top_indices = top_indices[np.argsort(-scores[top_indices])]
             return [candidates[i] for i in top_indices]
 
         except Exception as e:
@@ -3,13 +3,24 @@ from typing import Dict, List, Tuple
 from src.core.models import FileContext
 from .classifier import classifier
 from src.services.memory import memory
-from src.infrastructure.llm.nli import FallbackHandler
+from src.infrastructure.llm.nli import nli_classifier
 from src.config.settings import settings
 from src.utils.logger import logger
 from src.infrastructure.embeddings.sentence_transformer import model_manager
 
 from src.services.clustering import session_manager
 
+# FileTypeVoter lookups: exact MIME first, then the top-level type
+_MIME_EXACT_MAP = {
+    "text/x-python": ("Code", 0.8),
+    "application/pdf": ("Documents", 0.5),
+}
+_MIME_PREFIX_MAP = {
+    "image": ("Images", 0.9),
+    "video": ("Video", 0.9),
+    "audio": ("Audio", 0.9),
+}
+
 class Voter(ABC):
     @property
     @abstractmethod
@@ -49,11 +60,9 @@ class FileTypeVoter(Voter):
     
     def vote(self, context: FileContext) -> Tuple[str, float]:
         mime = context.mime_type
-        if mime.startswith('image/'): return "Images", 0.9
-        if mime.startswith('video/'): return "Video", 0.9
-        if mime.startswith('audio/'): return "Audio", 0.9
-        if mime.startswith('text/x-python') or context.extension == '.py': return "Code", 0.8
-        if mime == 'application/pdf': return "Documents", 0.5
+        hit = _MIME_EXACT_MAP.get(mime) or _MIME_PREFIX_MAP.get(mime.partition('/')[0])
+        if hit: return hit
+        if context.extension == '.py': return "Code", 0.8
         
         cat = classifier.classify_by_extension(context.path)
         if cat != "Unknown":
@@ -70,8 +79,9 @@ class SemanticVoter(Voter):
         if not context.text:
             return "Unknown", 0.0
 
-        import re
-        keywords = re.findall(r'\w+', context.text.lower())[:50]
+        if context.tokens_50 is None:
+            context.prepare()
+        keywords = list(context.tokens_50)
         cat, score = classifier.classify_by_keywords(keywords)
         
         if cat != "Unknown":
@@ -89,8 +99,11 @@ class HistoryVoter(Voter):
             return "Unknown", 0.0
         
         try:
-            model = model_manager.get_embedding_model()
-            embedding = model.encode(context.text[:500])
+            embedding = context.embedding
+            if embedding is None:
+                if context.text_500 is None:
+                    context.prepare()
+                embedding = model_manager.get_embedding_model().encode(context.text_500)
             category, score = memory.recall(embedding, threshold=0.70)
             
             if category:
@@ -108,15 +121,44 @@ class NLIVoter(Voter):
     weight = 0.9
     
     def __init__(self):
-        self.handler = FallbackHandler()
+        self.handler = nli_classifier
+        self._candidates: Tuple[str, ...] = ()
+        self._candidates_len = -1
+        
+    def _get_candidates(self) -> Tuple[str, ...]:
+        # CATEGORY_MAP only grows (startup discovery), so its size is a cheap change marker
+        category_map = settings.CATEGORY_MAP
+        if len(category_map) != self._candidates_len:
+            self._candidates = tuple(category_map.keys())
+            self._candidates_len = len(category_map)
+        return self._candidates
         
     def vote(self, context: FileContext) -> Tuple[str, float]:
         if not context.text: return "Unknown", 0.0
         
-        candidates = list(settings.CATEGORY_MAP.keys())
+        candidates = self._get_candidates()
         cat = self.handler.reason_placement(str(context.path), context.text, candidates)
         
         if cat != "Unknown":
             return cat, 0.85
             
         return "Unknown", 0.0
+
+def run_voters(context: FileContext, voters: List[Voter]) -> List[Tuple[str, str, float]]:
+    """
+    Runs the voters in order on the calling thread.
+    Returns (voter name, category, confidence) for every voter that didn't abstain.
+    """
+    # The file embedding is computed before voting, so the only inference left here is
+    # the semantic voter's short keyword encode; a pool would add handoff cost, not overlap.
+    # Files still run in parallel across processor workers.
+    votes = []
+    for v in voters:
+        try:
+            category, confidence = v.vote(context)
+        except Exception as e:
+            logger.error(f"Voter {v.name} failed: {e}")
+            continue
+        if category != "Unknown":
+            votes.append((v.name, category, confidence))
+    return votes
@@ -21,6 +21,8 @@ class EventBroker:
     ACTION_COMPLETED = signal("action-completed")  # Payload: {path: Path, new_path: Path}
     ACTION_FAILED = signal("action-failed")        # Payload: {path: Path, error: str}
     
+    ATLAS_UPDATED = signal("atlas-updated")        # Payload: {} - folder index was rebuilt, gained a folder or a folder switched to its centroid
+    
     ERROR = signal("system-error")                 # Payload: {source: str, error: Exception}
     
     def __init__(self):
@@ -32,6 +34,9 @@ class EventBroker:
         self.ERROR.connect(self._log_error)
 
     def _log_event(self, sender, **kwargs):
+        # Skip building the message (and repr-ing kwargs) unless debug logging is on
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
         sender_name = getattr(sender, 'name', str(sender))
         logger.debug(f"Event {sender_name} fired with args: {kwargs}")
 
@@ -1,9 +1,13 @@
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 from pathlib import Path
+import base64
+import re
 import numpy as np
 
+_WORD_RE = re.compile(r'\w+')
+
 @dataclass
 class FileContext:
     path: Path
@@ -12,6 +16,21 @@ class FileContext:
     text: str = ""
     metadata: Dict = field(default_factory=dict)
     
+    # Derived views of `text` shared by all voters; filled by prepare()
+    text_500: Optional[str] = None
+    text_lower_2000: Optional[str] = None
+    tokens_50: Optional[Tuple[str, ...]] = None
+    has_body: bool = False
+    # (1, dim) encoding of text_500 when the pipeline already computed it
+    embedding: Optional[np.ndarray] = None
+    
+    def prepare(self):
+        """Compute the derived text views once. Call again after replacing `text`."""
+        self.text_500 = self.text[:500]
+        self.has_body = len(self.text.strip()) > 20
+        self.text_lower_2000 = self.text[:2000].lower()
+        self.tokens_50 = tuple(m.group(0) for _, m in zip(range(50), _WORD_RE.finditer(self.text_lower_2000)))
+    
     @property
     def extension(self) -> str:
         return self.path.suffix.lower()
@@ -25,38 +44,87 @@ class FolderCluster:
                  name_embedding: np.ndarray = None, n_files: int = 0):
         self.path = path
         self.centroid = centroid  # Average embedding of file contents
-        self.name_embedding = name_embedding 
+        self.name_embedding = name_embedding  # Stored unit-length
         self.n_files = n_files
     
+    @property
+    def centroid(self) -> Optional[np.ndarray]:
+        return self._centroid
+    
+    @centroid.setter
+    def centroid(self, value: Optional[np.ndarray]):
+        # The raw running mean is kept (it must stay unnormalized); its unit copy is cached
+        self._centroid = value
+        self._unit_centroid = None
+    
+    @property
+    def name_embedding(self) -> Optional[np.ndarray]:
+        return self._name_embedding
+    
+    @name_embedding.setter
+    def name_embedding(self, value: Optional[np.ndarray]):
+        self._name_embedding = None if value is None else _unit_vector(value)
+    
     def update_centroid(self, new_embedding: np.ndarray):
         """Incrementally update centroid using running average."""
         if self.centroid is None:
-            self.centroid = new_embedding
+            # Own a contiguous float32 copy so later in-place updates never touch the caller's array
+            self.centroid = np.array(new_embedding, dtype=np.float32).reshape(-1)
             self.n_files = 1
         else:
-            # Running average formula: new_avg = old_avg + (new_val - old_avg) / (n + 1)
+            # Running average, in place: new_avg = old_avg * (n - 1) / n + new_val / n
             self.n_files += 1
-            self.centroid = self.centroid + (new_embedding - self.centroid) / self.n_files
+            w = 1.0 / self.n_files
+            self._centroid *= 1.0 - w
+            self._centroid += w * np.ravel(new_embedding)
+            self._unit_centroid = None
     
     def get_effective_embedding(self) -> Optional[np.ndarray]:
-        """Returns centroid if available, else name embedding."""
-        if self.centroid is not None and self.n_files >= MIN_FILES_FOR_CENTROID:
-            return self.centroid
-        return self.name_embedding
+        """Returns the unit-length centroid if available, else the (unit) name embedding."""
+        if self._centroid is not None and self.n_files >= MIN_FILES_FOR_CENTROID:
+            if self._unit_centroid is None:
+                self._unit_centroid = _unit_vector(self._centroid)
+            return self._unit_centroid
+        return self._name_embedding
     
     def to_dict(self) -> dict:
         return {
             "path": self.path,
-            "centroid": self.centroid.tolist() if self.centroid is not None else None,
-            "name_embedding": self.name_embedding.tolist() if self.name_embedding is not None else None,
+            "centroid_b64": _encode_vector(self.centroid),
+            "name_embedding_b64": _encode_vector(self.name_embedding),
             "n_files": self.n_files
         }
     
     @classmethod
     def from_dict(cls, data: dict) -> "FolderCluster":
+        # Older indexes stored vectors as JSON float lists
+        if "centroid_b64" in data or "name_embedding_b64" in data:
+            centroid = _decode_vector(data.get("centroid_b64"))
+            name_embedding = _decode_vector(data.get("name_embedding_b64"))
+        else:
+            centroid = np.array(data["centroid"], dtype=np.float32) if data.get("centroid") else None
+            name_embedding = np.array(data["name_embedding"], dtype=np.float32) if data.get("name_embedding") else None
         return cls(
             path=data["path"],
-            centroid=np.array(data["centroid"], dtype=np.float32) if data.get("centroid") else None,
-            name_embedding=np.array(data["name_embedding"], dtype=np.float32) if data.get("name_embedding") else None,
+            centroid=centroid,
+            name_embedding=name_embedding,
             n_files=data.get("n_files", 0)
         )
+
+def _unit_vector(vec: np.ndarray) -> np.ndarray:
+    """Flat float32 copy scaled to unit length, so cosine similarity is a plain dot product."""
+    vec = np.array(vec, dtype=np.float32).reshape(-1)
+    vec /= np.linalg.norm(vec) + 1e-8
+    return vec
+
+def _encode_vector(vec: Optional[np.ndarray]) -> Optional[str]:
+    """Raw float32 bytes, base64'd for JSON: ~4x smaller than a float list and a single memcpy."""
+    if vec is None:
+        return None
+    return base64.b64encode(np.asarray(vec, dtype=np.float32).tobytes()).decode("ascii")
+
+def _decode_vector(data: Optional[str]) -> Optional[np.ndarray]:
+    if not data:
+        return None
+    # Copy: frombuffer views are read-only and centroids are updated in place
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32).copy()
@@ -1,4 +1,5 @@
 from pathlib import Path
+from sqlalchemy import event
 from sqlmodel import create_engine, SQLModel, Session
 from src.config.settings import settings
 from src.utils.logger import logger
@@ -9,6 +10,18 @@ DB_URL = f"sqlite:///{DB_DIR}/{DB_NAME}"
 DB_DIR.mkdir(parents=True, exist_ok=True)
 engine = create_engine(DB_URL, echo=False, connect_args={"check_same_thread": False})
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL + NORMAL sync: commits append to the log instead of fsyncing the main DB each time,
+    # and readers don't block the writer during bursts of per-file inserts.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-20000")
+    cursor.close()
+
 def init_db():
     try:
         from . import models
@@ -2,8 +2,19 @@ from datetime import datetime
 from typing import Optional
 from sqlmodel import Field, SQLModel
 from pathlib import Path
+import functools
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+@functools.lru_cache(maxsize=256)
+def _parse_rollback(raw: str) -> dict:
+    """Parse once per distinct JSON string; callers get a copy."""
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
 class FileIndex(SQLModel, table=True):
     file_hash: str = Field(primary_key=True, index=True, description="SHA-256 hash of the file content")
     last_seen: datetime = Field(default_factory=datetime.now)
@@ -23,11 +34,12 @@ class Transaction(SQLModel, table=True):
     
     @property
     def rollback_data(self) -> dict:
-        return json.loads(self.rollback_data_json)
+        # Rows loaded by SQLAlchemy skip __init__, so the cache lives outside the instance
+        return dict(_parse_rollback(self.rollback_data_json))
     
     @rollback_data.setter
     def rollback_data(self, value: dict):
-        self.rollback_data_json = json.dumps(value)
+        self.rollback_data_json = orjson.dumps(value).decode() if orjson else json.dumps(value)
 
 class Feedback(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
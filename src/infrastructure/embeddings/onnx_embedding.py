@@ -1,6 +1,9 @@
 
 import os
 import time
+import gc
+import hashlib
+from collections import OrderedDict
 import numpy as np
 from pathlib import Path
 from typing import List, Union
@@ -18,12 +21,55 @@ class ModelManager:
         self._load_lock = threading.Lock()
         self.keep_alive_seconds = 60
         self.model_id = "Xenova/all-MiniLM-L6-v2"
-        self.onnx_filename = "onnx/model_quantized.onnx" 
+        self.onnx_filename = "onnx/model_quantized.onnx" # Dynamic INT8 (QInt8) export
+        self.fallback_onnx_filename = "onnx/model.onnx" # FP32, used only if the INT8 graph can't load
         self._input_names = set()
+        self.optimized_dir = Path.home() / ".sortify"
+        # Exact-text LRU for single-string encodes (~1.5 KB per entry)
+        self.cache_size = 4096
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
 
     def get_sentence_embedding_dimension(self) -> int:
         return 384
 
+    def _session_options(self) -> ort.SessionOptions:
+        sess_options = ort.SessionOptions()
+        sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        sess_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # Single thread per session: processor workers already run encodes in parallel
+        sess_options.intra_op_num_threads = 1
+        # Reuse allocations across the many short, similarly-shaped batches we run
+        sess_options.enable_mem_pattern = True
+        sess_options.enable_cpu_mem_arena = True
+        # Don't busy-wait between runs; this is a background process
+        sess_options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        return sess_options
+
+    def _create_session(self, onnx_filename: str) -> ort.InferenceSession:
+        """
+        Creates a session for the given model file, reusing the fused graph ORT
+        serialized on a previous start when available.
+        """
+        providers = [("CPUExecutionProvider", {"arena_extend_strategy": "kSameAsRequested"})]
+        optimized_path = self.optimized_dir / f"{self.model_id.replace('/', '_')}_{Path(onnx_filename).stem}.opt.onnx"
+
+        if optimized_path.exists():
+            sess_options = self._session_options()
+            # Already fused; skip re-running the optimizer
+            sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            try:
+                return ort.InferenceSession(str(optimized_path), sess_options, providers=providers)
+            except Exception as e:
+                logger.warning(f"Discarding unreadable optimized model {optimized_path.name}: {e}")
+                optimized_path.unlink(missing_ok=True)
+
+        model_path = hf_hub_download(repo_id=self.model_id, filename=onnx_filename)
+        sess_options = self._session_options()
+        optimized_path.parent.mkdir(parents=True, exist_ok=True)
+        sess_options.optimized_model_filepath = str(optimized_path)
+        return ort.InferenceSession(model_path, sess_options, providers=providers)
+
     def _load_model(self):
         """Thread-safe lazy loader to avoid concurrent heavy inits."""
         if self._session is not None:
@@ -42,11 +88,11 @@ class ModelManager:
                 self._tokenizer.enable_truncation(max_length=512)
                 self._tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
 
-                model_path = hf_hub_download(repo_id=self.model_id, filename=self.onnx_filename)
-                
-                sess_options = ort.SessionOptions()
-                sess_options.intra_op_num_threads = 1 # Single thread is enough for bg task, saves CPU contention
-                self._session = ort.InferenceSession(model_path, sess_options)
+                try:
+                    self._session = self._create_session(self.onnx_filename)
+                except Exception as e:
+                    logger.warning(f"INT8 model unavailable ({e}). Falling back to FP32.")
+                    self._session = self._create_session(self.fallback_onnx_filename)
                 self._input_names = {i.name for i in self._session.get_inputs()}
                 
                 logger.info("ONNX Model Loaded Successfully.")
@@ -61,56 +107,123 @@ class ModelManager:
             logger.info("Unloading ONNX model to save RAM.")
             self._session = None
             self._tokenizer = None
-            import gc
             gc.collect() # Force cleanup
 
     def get_embedding_model(self):
         return self
 
+    def warm_up(self):
+        """Load the session now, so the first file event doesn't pay for it."""
+        try:
+            self._load_model()
+        except Exception as e:
+            # Encodes will retry the lazy load; don't fail startup over it
+            logger.warning(f"Embedding model warm-up failed: {e}")
+
+    def _infer(self, input_ids: np.ndarray, attention_mask: np.ndarray, token_type_ids: np.ndarray = None) -> np.ndarray:
+        """Run the session on one padded batch; returns L2-normalized mean-pooled rows."""
+        inputs = {
+            'input_ids': input_ids,
+            'attention_mask': attention_mask,
+        }
+        if token_type_ids is not None:
+            inputs['token_type_ids'] = token_type_ids
+        
+        # Run Inference
+        outputs = self._session.run(None, inputs)
+        last_hidden_state = np.ascontiguousarray(outputs[0])
+        
+        # Masked mean pooling as one contraction; no (B, L, D) temporaries
+        embeddings = np.einsum('bld,bl->bd', last_hidden_state, attention_mask.astype(last_hidden_state.dtype), optimize=True)
+        counts = attention_mask.sum(axis=1, dtype=np.float32).clip(min=1e-9)[:, None]
+        embeddings /= counts
+        
+        # Normalize embeddings in place
+        norms = np.sqrt(np.einsum('bd,bd->b', embeddings, embeddings)).clip(min=1e-9)[:, None]
+        embeddings /= norms
+        return embeddings
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        """Single-string path: no padding, sorting or batch bookkeeping. Returns (1, dim)."""
+        self._load_model()
+        self._last_used = time.time()
+
+        e = self._tokenizer.encode(text)
+        input_ids = np.array(e.ids, dtype=np.int64).reshape(1, -1)
+        attention_mask = np.array(e.attention_mask, dtype=np.int64).reshape(1, -1)
+        token_type_ids = None
+        if 'token_type_ids' in self._input_names:
+            token_type_ids = np.array(e.type_ids, dtype=np.int64).reshape(1, -1)
+        return self._infer(input_ids, attention_mask, token_type_ids)
+
+    @staticmethod
+    def _cache_key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
     def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, show_progress_bar: bool = False, convert_to_numpy: bool = True) -> Union[List[np.ndarray], np.ndarray]:
         if isinstance(sentences, str):
-            sentences = [sentences]
+            key = self._cache_key(sentences)
+            with self._cache_lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self._last_used = time.time()
+                    return cached
+
+            embedding = self._encode_one(sentences)
+            # Shared between callers, so make accidental in-place edits fail loudly
+            embedding.flags.writeable = False
+            with self._cache_lock:
+                self._cache[key] = embedding
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return embedding
             
         self._load_model()
         self._last_used = time.time()
 
-        all_embeddings = []
+        # Each batch is written straight into its caller-order rows; no per-batch list + vstack
+        final_embeddings = np.empty((len(sentences), self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        # Reuse texts already encoded on their own (e.g. a file the pipeline just encoded).
+        # Batch results aren't added to the LRU so large scans don't flush it.
+        misses = []
+        with self._cache_lock:
+            for i, sentence in enumerate(sentences):
+                cached = self._cache.get(self._cache_key(sentence))
+                if cached is None:
+                    misses.append(i)
+                else:
+                    final_embeddings[i] = cached
+        if not misses:
+            return final_embeddings
+
+        # Smart batching: group similar lengths so each batch pads to less
+        order = np.array(sorted(misses, key=lambda i: len(sentences[i])), dtype=np.intp)
+        sentences = [sentences[i] for i in order]
         
         # Batch processing
         for i in range(0, len(sentences), batch_size):
             batch = sentences[i : i + batch_size]
             encoded = self._tokenizer.encode_batch(batch)
             
-            # Prepare inputs for ONNX
-            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
-            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
-            inputs = {
-                'input_ids': input_ids,
-                'attention_mask': attention_mask,
-            }
-
-            if 'token_type_ids' in self._input_names:
-                inputs['token_type_ids'] = np.array([e.type_ids for e in encoded], dtype=np.int64)
-            
-            # Run Inference
-            outputs = self._session.run(None, inputs)
-            last_hidden_state = outputs[0]
-            input_mask_expanded = np.expand_dims(attention_mask, -1)
-            
-            sum_embeddings = np.sum(last_hidden_state * input_mask_expanded, axis=1)
-            sum_mask = np.clip(input_mask_expanded.sum(axis=1), a_min=1e-9, a_max=None)
-            
-            embeddings = sum_embeddings / sum_mask
-            
-            # Normalize embeddings
-            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-            embeddings = embeddings / np.clip(norms, a_min=1e-9, a_max=None)
-            
-            all_embeddings.append(embeddings)
+            # Prepare inputs for ONNX: fill preallocated buffers row by row instead of
+            # building lists of lists (the exported graph declares int64 inputs)
+            max_len = max(len(e.ids) for e in encoded)
+            input_ids = np.zeros((len(encoded), max_len), dtype=np.int64)
+            attention_mask = np.zeros_like(input_ids)
+            use_type_ids = 'token_type_ids' in self._input_names
+            token_type_ids = np.zeros_like(input_ids) if use_type_ids else None
+            for row, e in enumerate(encoded):
+                n_tokens = len(e.ids)
+                input_ids[row, :n_tokens] = e.ids
+                attention_mask[row, :n_tokens] = e.attention_mask
+                if use_type_ids:
+                    token_type_ids[row, :n_tokens] = e.type_ids
+
+            embeddings = self._infer(input_ids, attention_mask, token_type_ids)
+            final_embeddings[order[i : i + batch_size]] = embeddings
 
-        # Concatenate batches
-        final_embeddings = np.vstack(all_embeddings)
-        
         return final_embeddings
 
 model_manager = ModelManager()
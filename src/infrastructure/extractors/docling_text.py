@@ -1,3 +1,4 @@
+import threading
 from pathlib import Path
 from pathlib import Path
 from src.utils.logger import logger
@@ -6,19 +7,25 @@ class TextExtractor:
     def __init__(self):
         self._md = None
         self._doc_converter = None
+        # Atlas scans extract from several threads; build each converter only once
+        self._init_lock = threading.Lock()
 
     @property
     def md(self):
         if self._md is None:
-            from markitdown import MarkItDown
-            self._md = MarkItDown()
+            with self._init_lock:
+                if self._md is None:
+                    from markitdown import MarkItDown
+                    self._md = MarkItDown()
         return self._md
 
     @property
     def doc_converter(self):
         if self._doc_converter is None:
-            from docling.document_converter import DocumentConverter
-            self._doc_converter = DocumentConverter()
+            with self._init_lock:
+                if self._doc_converter is None:
+                    from docling.document_converter import DocumentConverter
+                    self._doc_converter = DocumentConverter()
         return self._doc_converter
 
     def extract(self, file_path: Path, max_chars: int = 2000) -> str:
@@ -1,7 +1,32 @@
+import codecs
+import functools
+import mimetypes
+import threading
 from pathlib import Path
+from typing import Optional
 from src.config.settings import settings
 from src.utils.logger import logger
 
+# Skip 'markitdown' (which is text-centric) for these.
+# IMAGES: return empty string so OCR fallback can run in enrichment.py
+# VIDEO/AUDIO/ARCHIVE: use filename as context (no text extraction possible)
+_IMAGE_PREFIXES = ("image/",)
+_MEDIA_PREFIXES = ("video/", "audio/", "application/zip", "application/x-tar", "application/x-7z-compressed")
+# Byte-order marks we can decode directly; UTF-32 first since its LE mark starts with UTF-16's
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+_SKIP_EXTS = frozenset({".exe", ".bin", ".iso", ".dll", ".so", ".dylib", ".msi", ".dmg", ".app", ".apk", ".deb", ".rpm"})
+
+@functools.lru_cache(maxsize=256)
+def _guess_mime(suffixes: str):
+    """mimetypes only looks at the trailing suffixes, so cache by them."""
+    return mimetypes.guess_type("file" + suffixes)[0]
+
 class Ingestor:
     """
     The 'Eye' of the pipeline.
@@ -12,49 +37,75 @@ class Ingestor:
     """
     def __init__(self):
         self._md = None
+        # Atlas scans and processor workers extract concurrently; build MarkItDown only once
+        self._md_lock = threading.Lock()
         self.max_chars = 1200 # Hard limit for RAM optimization
+        # Formats MarkItDown passes through unchanged, so a bounded read is equivalent
+        self.raw_text_mimes = {"text/plain", "text/markdown"}
 
     @property
     def md(self):
         if self._md is None:
-            from markitdown import MarkItDown
-            self._md = MarkItDown()
+            with self._md_lock:
+                if self._md is None:
+                    from markitdown import MarkItDown
+                    self._md = MarkItDown()
         return self._md
 
+    def _read_head(self, file_path: Path) -> Optional[str]:
+        """
+        Single bounded read; 4 bytes per char covers any encoding we decode here.
+        Honours a BOM, otherwise requires valid UTF-8. Returns None for anything
+        else so the caller can hand the file to MarkItDown's charset detection.
+        """
+        with open(file_path, "rb") as f:
+            data = f.read(self.max_chars * 4)
+
+        encoding = "utf-8"
+        for bom, name in _BOMS:
+            if data.startswith(bom):
+                data, encoding = data[len(bom):], name
+                break
+        # Incremental decode so a character cut off by the bounded read isn't an error
+        try:
+            return codecs.getincrementaldecoder(encoding)().decode(data, final=False)
+        except UnicodeDecodeError:
+            return None
+
     def extract_text(self, file_path: Path) -> str:
         """
         Extracts text from the given file snippet.
         """
         try:
-            if not file_path.exists():
+            try:
+                st = file_path.stat()
+            except FileNotFoundError:
                 return ""
             
             # Skip expensive/unsupported conversion for binary media
-            import mimetypes
-            mime_type, _ = mimetypes.guess_type(file_path)
-            
-            # List of prefixes/extensions to skip 'markitdown' (which is text-centric)
-            # For IMAGES: return empty string so OCR fallback can run in enrichment.py
-            # For VIDEO/AUDIO/ARCHIVE: use filename as context (no text extraction possible)
-            image_prefixes = ["image/"]
-            media_prefixes = ["video/", "audio/", "application/zip", "application/x-tar", "application/x-7z-compressed"]
-            skip_exts = {".exe", ".bin", ".iso", ".dll", ".so", ".dylib", ".msi", ".dmg", ".app", ".apk", ".deb", ".rpm"}
+            mime_type = _guess_mime("".join(file_path.suffixes))
             
             # Images: Return empty to trigger OCR in enrichment.py
-            if mime_type and any(mime_type.startswith(prefix) for prefix in image_prefixes):
+            if mime_type and mime_type.startswith(_IMAGE_PREFIXES):
                 return ""  # Let OCR handle it
             
             # Other media: Use filename as context
-            if (mime_type and any(mime_type.startswith(prefix) for prefix in media_prefixes)) or \
-               (file_path.suffix.lower() in skip_exts):
+            if (mime_type and mime_type.startswith(_MEDIA_PREFIXES)) or \
+               (file_path.suffix.lower() in _SKIP_EXTS):
                  # Just use the filename
                  return file_path.stem.replace("_", " ").replace("-", " ")
 
-            # Check size before attempting conversion to avoid hanging on large text files
-            if file_path.stat().st_size > 10 * 1024 * 1024: # > 10MB text file is too big for this quick check
-                 return file_path.stem.replace("_", " ").replace("-", " ")
-            result = self.md.convert(str(file_path))
-            text = result.text_content
+            # Plain text needs no conversion: read just the head instead of the whole file
+            # (non-UTF-8 text without a BOM still goes through MarkItDown below)
+            text = None
+            if mime_type and (mime_type in self.raw_text_mimes or mime_type.startswith("text/x-")):
+                text = self._read_head(file_path)
+            if text is None:
+                # Check size before attempting conversion to avoid hanging on large text files
+                if st.st_size > 10 * 1024 * 1024: # > 10MB text file is too big for this quick check
+                     return file_path.stem.replace("_", " ").replace("-", " ")
+                result = self.md.convert(str(file_path))
+                text = result.text_content
             
             if not text:
                 return ""
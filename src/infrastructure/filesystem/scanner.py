@@ -1,4 +1,5 @@
 import os
+import re
 from pathlib import Path
 from typing import Dict, List
 from src.config.settings import settings
@@ -26,10 +27,12 @@ class ContextScanner:
             "debug", "release", "x64", "x86", "config", "settings", "env"
         }
         # Ensure all are lowercase for case-insensitive camparisons
-        self.ignore_names = {n.lower() for n in self.ignore_names}
-        import re
+        self.ignore_names = frozenset(n.lower() for n in self.ignore_names)
         self.uuid_pattern = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
 
+    def _is_ignored(self, name: str) -> bool:
+        return name.startswith(".") or name.lower() in self.ignore_names or self.uuid_pattern.match(name) is not None
+
     def scan(self) -> Dict[str, Path]:
         """
         Scans roots and returns a map of {Category: Path}.
@@ -46,28 +49,23 @@ class ContextScanner:
                 root_path = str(root)
                 root_depth = root_path.count(os.sep)
                 
+                # The root itself may be an ignored name; children are pruned before descent
+                if self._is_ignored(os.path.basename(root_path)):
+                    continue
+                
                 for current, dirs, files in os.walk(root_path):
-                    current_path = Path(current)
-                    
-                    # Check depth
-                    if current_path.name.lower() in self.ignore_names or current_path.name.startswith("."):
-                         dirs[:] = []
-                         continue
-                    
-                    # Ignore UUIDs / Hashes
-                    if self.uuid_pattern.match(current_path.name):
-                         dirs[:] = []
-                         continue
-
                     depth = current.count(os.sep) - root_depth
-                    if depth > self.max_depth:
+                    
+                    # Prune ignored and too-deep subtrees so os.walk never enters them
+                    if depth >= self.max_depth:
                         dirs[:] = []
-                        continue
+                    else:
+                        dirs[:] = [d for d in dirs if not self._is_ignored(d)]
                         
                     # Evaluate current folder name
                     # Don't evaluate the root itself usually, unless it's like "My Finance"
                     if depth > 0:
-                        self._evaluate_folder(current_path, discovered)
+                        self._evaluate_folder(Path(current), discovered)
                         
             except Exception as e:
                 logger.warning(f"Failed to scan {root}: {e}")
@@ -1,4 +1,6 @@
 
+import fnmatch
+import re
 import threading
 from pathlib import Path
 from watchfiles import watch, Change
@@ -12,6 +14,9 @@ class FileWatcher:
         self.stop_event = threading.Event()
         self.watch_thread = None
         self.paused = False
+        # IGNORE_PATTERNS compiled once into a single alternation over the file name
+        self._ignore_re = re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in settings.IGNORE_PATTERNS)) if settings.IGNORE_PATTERNS else None
+        self._skip_suffixes = frozenset({".crdownload", ".part", ".tmp", ".download", ".aria2"})
 
     def pause(self):
         self.paused = True
@@ -63,12 +68,11 @@ class FileWatcher:
             return False
             
         # Check ignore patterns
-        for pattern in settings.IGNORE_PATTERNS:
-            if path.match(pattern):
-                return False
+        if self._ignore_re is not None and self._ignore_re.match(path.name):
+            return False
 
         # Ignore incomplete downloads and temp files
-        if path.suffix in {".crdownload", ".part", ".tmp", ".download", ".aria2"}:
+        if path.suffix in self._skip_suffixes:
             return False
                 
         # Check if file is hidden (starts with .)
@@ -1,9 +1,12 @@
 
+import gc
 import os
 import time
 import numpy as np
 import psutil
 import threading
+from collections import OrderedDict
+from pathlib import Path
 from typing import List, Tuple, Dict
 from huggingface_hub import hf_hub_download
 from tokenizers import Tokenizer
@@ -24,15 +27,65 @@ class NLIClassifier:
         self.onnx_filename = "onnx/model_quantized.onnx"
         self.min_ram_mb = 300
         self.input_names = []
+        self.max_length = 256
+        self._cls_id = self._sep_id = self._pad_id = 0
+        self.optimized_dir = Path.home() / ".sortify"
+        # Tokenized hypotheses per folder set; the set rarely changes between files
+        self.hyp_cache_size = 8
+        self._hyp_cache: "OrderedDict[Tuple[str, ...], Tuple[List[np.ndarray], np.ndarray]]" = OrderedDict()
+        self._hyp_cache_lock = threading.Lock()
+        # Drop the session after this long without a call; the next call reloads it
+        self.idle_unload_seconds = 600
+        self._reaper = None
 
-    def _load_model(self):
-        """Lazy load the ONNX model."""
-        if self._session is not None:
-            return
+    def _session_options(self) -> ort.SessionOptions:
+        """Options for the single session shared by every NLI call."""
+        sess_options = ort.SessionOptions()
+        sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        sess_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # NLI runs one large batch at a time, so let it use the physical cores (capped)
+        sess_options.intra_op_num_threads = max(1, min(psutil.cpu_count(logical=False) or 2, 4))
+        sess_options.inter_op_num_threads = 1
+        sess_options.enable_mem_pattern = True
+        sess_options.enable_cpu_mem_arena = True
+        # Don't busy-wait between runs; this is a background process
+        sess_options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        return sess_options
 
+    def _create_session(self) -> ort.InferenceSession:
+        """
+        Creates the session, reusing the fused graph ORT serialized on a previous
+        start when available.
+        """
+        providers = ["CPUExecutionProvider"]
+        optimized_path = self.optimized_dir / f"{self.model_id.replace('/', '_')}_{Path(self.onnx_filename).stem}.opt.onnx"
+
+        if optimized_path.exists():
+            sess_options = self._session_options()
+            # Already fused; skip re-running the optimizer
+            sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            try:
+                return ort.InferenceSession(str(optimized_path), sess_options, providers=providers)
+            except Exception as e:
+                logger.warning(f"Discarding unreadable optimized model {optimized_path.name}: {e}")
+                optimized_path.unlink(missing_ok=True)
+
+        model_path = hf_hub_download(repo_id=self.model_id, filename=self.onnx_filename)
+        sess_options = self._session_options()
+        optimized_path.parent.mkdir(parents=True, exist_ok=True)
+        sess_options.optimized_model_filepath = str(optimized_path)
+        return ort.InferenceSession(model_path, sess_options, providers=providers)
+
+    def _load_model(self) -> Tuple[ort.InferenceSession, Tokenizer]:
+        """
+        Lazy load the ONNX model. Returns the session and tokenizer captured under the
+        lock, so a caller keeps working with them even if the reaper unloads right after.
+        """
         with self._load_lock:
+            # Touch under the lock so the reaper sees this call before deciding to unload
+            self._last_used = time.time()
             if self._session is not None:
-                return
+                return self._session, self._tokenizer
 
             try:
                 free_mem = psutil.virtual_memory().available / (1024 * 1024)
@@ -45,69 +98,137 @@ class NLIClassifier:
                 tokenizer_path = hf_hub_download(repo_id=self.model_id, filename="tokenizer.json")
                 self._tokenizer = Tokenizer.from_file(tokenizer_path)
                 # Shorter max length and dynamic padding to lower RAM per request
-                self._tokenizer.enable_truncation(max_length=256)
+                self._tokenizer.enable_truncation(max_length=self.max_length)
                 self._tokenizer.enable_padding()
+                self._cls_id = self._tokenizer.token_to_id("[CLS]")
+                self._sep_id = self._tokenizer.token_to_id("[SEP]")
+                self._pad_id = self._tokenizer.token_to_id("[PAD]") or 0
 
                 # 2. ONNX Model
-                model_path = hf_hub_download(repo_id=self.model_id, filename=self.onnx_filename)
-                sess_options = ort.SessionOptions()
-                sess_options.intra_op_num_threads = 2
-                self._session = ort.InferenceSession(model_path, sess_options)
+                self._session = self._create_session()
                 
                 # Introspect inputs to decide on token_type_ids
                 self.input_names = [i.name for i in self._session.get_inputs()]
                 logger.info(f"NLI Model Loaded. Inputs: {self.input_names}")
-                self._last_used = time.time()
+
+                if self._reaper is None:
+                    self._reaper = threading.Thread(target=self._reap_idle, daemon=True, name="nli-reaper")
+                    self._reaper.start()
                 
             except Exception as e:
                 logger.error(f"Failed to load NLI model: {e}")
                 raise e
 
+            return self._session, self._tokenizer
+
+    def _reap_idle(self):
+        """Unloads the session once it has sat idle for idle_unload_seconds."""
+        while True:
+            time.sleep(60)
+            with self._load_lock:
+                if self._session is None or time.time() - self._last_used < self.idle_unload_seconds:
+                    continue
+                self._session = None
+                self._tokenizer = None
+            gc.collect()
+            logger.info("NLI model unloaded after idle period")
+
     def _predict_batch(self, premise: str, hypotheses: List[str]) -> np.ndarray:
         """
         Runs NLI comparison.
         Returns array of entailment scores (one per hypothesis).
         """
-        self._load_model()
-        self._last_used = time.time()
+        session, tokenizer = self._load_model()
+        if not hypotheses:
+            return np.empty(0, dtype=np.float32)
+
+        # Tokenize the premise once and all hypotheses in one call, then assemble
+        # [CLS] premise [SEP] hypothesis [SEP] rows ourselves instead of re-tokenizing
+        # the premise for every pair.
+        p_ids = np.array(tokenizer.encode(premise, add_special_tokens=False).ids, dtype=np.int64)
+        h_ids, h_lens = self._tokenize_hypotheses(tokenizer, hypotheses)
 
-        pairs = [(premise, h) for h in hypotheses]
-        batch_size = 8
-        all_logits = []
+        # Same result as longest-first pair truncation while the premise stays the longer side
+        budget = self.max_length - 3
+        if len(h_lens) and h_lens.max() > budget // 2:
+            return self._predict_pairs(session, tokenizer, premise, hypotheses)
+        p_lens = np.minimum(len(p_ids), budget - h_lens)
+        lens = p_lens + h_lens + 3
+
+        batch_size = 32
+        use_type_ids = 'token_type_ids' in self.input_names
+        # Visit rows shortest-first so each batch pads only to its own longest pair;
+        # logits are scattered back into hypothesis order
+        order = np.argsort(lens, kind="stable")
+        final_logits = None
         
-        for i in range(0, len(pairs), batch_size):
-            batch_pairs = pairs[i : i + batch_size]
-            
-            encoded_batch = []
-            for p, h in batch_pairs:
-                enc = self._tokenizer.encode(p, h)
-                encoded_batch.append(enc)
-                
-            input_ids = np.array([e.ids for e in encoded_batch], dtype=np.int64)
-            attention_mask = np.array([e.attention_mask for e in encoded_batch], dtype=np.int64)
-            
+        for i in range(0, len(hypotheses), batch_size):
+            rows = order[i : i + batch_size]
+            batch_lens = lens[rows]
+            max_len = int(batch_lens.max())
+            input_ids = np.full((len(rows), max_len), self._pad_id, dtype=np.int64)
+            token_type_ids = np.zeros_like(input_ids)
+            for r, j in enumerate(rows):
+                pl, hl = p_lens[j], h_lens[j]
+                input_ids[r, 0] = self._cls_id
+                input_ids[r, 1 : pl + 1] = p_ids[:pl]
+                input_ids[r, pl + 1] = self._sep_id
+                input_ids[r, pl + 2 : pl + 2 + hl] = h_ids[j]
+                input_ids[r, pl + 2 + hl] = self._sep_id
+                token_type_ids[r, pl + 2 : pl + 3 + hl] = 1
+            attention_mask = (np.arange(max_len) < batch_lens[:, None]).astype(np.int64)
+
             inputs = {
                 'input_ids': input_ids,
                 'attention_mask': attention_mask,
             }
+            if use_type_ids:
+                inputs['token_type_ids'] = token_type_ids
             
-            # Contextual handling of token_type_ids
-            if 'token_type_ids' in self.input_names:
-                inputs['token_type_ids'] = np.array([e.type_ids for e in encoded_batch], dtype=np.int64)
-            
-            outputs = self._session.run(None, inputs)
-            logits = outputs[0] 
-            all_logits.append(logits)
+            logits = session.run(None, inputs)[0]
+            if final_logits is None:
+                final_logits = np.empty((len(hypotheses), logits.shape[1]), dtype=logits.dtype)
+            final_logits[rows] = logits
             
-        final_logits = np.vstack(all_logits)
-        
-        # Softmax
-        exp_logits = np.exp(final_logits - np.max(final_logits, axis=1, keepdims=True))
-        probs = exp_logits / np.sum(exp_logits, axis=1, keepdims=True)
-        
+        return self._entailment_scores(final_logits)
+
+    def _tokenize_hypotheses(self, tokenizer: Tokenizer, hypotheses: List[str]) -> Tuple[List[np.ndarray], np.ndarray]:
+        """Hypothesis token ids (no special tokens) and lengths, LRU-cached by hypothesis set."""
+        key = tuple(hypotheses)
+        with self._hyp_cache_lock:
+            cached = self._hyp_cache.get(key)
+            if cached is not None:
+                self._hyp_cache.move_to_end(key)
+                return cached
+
+        h_encs = tokenizer.encode_batch(hypotheses, add_special_tokens=False)
+        h_ids = [np.array(e.ids[:sum(e.attention_mask)], dtype=np.int64) for e in h_encs]
+        h_lens = np.array([len(h) for h in h_ids], dtype=np.int64)
+        with self._hyp_cache_lock:
+            self._hyp_cache[key] = (h_ids, h_lens)
+            if len(self._hyp_cache) > self.hyp_cache_size:
+                self._hyp_cache.popitem(last=False)
+        return h_ids, h_lens
+
+    def _predict_pairs(self, session: ort.InferenceSession, tokenizer: Tokenizer,
+                       premise: str, hypotheses: List[str]) -> np.ndarray:
+        """Tokenizer-driven pair encoding; used when a hypothesis is too long for the fast path."""
+        encoded = tokenizer.encode_batch([(premise, h) for h in hypotheses])
+        inputs = {
+            'input_ids': np.array([e.ids for e in encoded], dtype=np.int64),
+            'attention_mask': np.array([e.attention_mask for e in encoded], dtype=np.int64),
+        }
+        if 'token_type_ids' in self.input_names:
+            inputs['token_type_ids'] = np.array([e.type_ids for e in encoded], dtype=np.int64)
+        return self._entailment_scores(session.run(None, inputs)[0])
+
+    def _entailment_scores(self, final_logits: np.ndarray) -> np.ndarray:
         # MobileBERT MNLI: In this specific quantized model, observation shows Index 0 is Entailment.
         # Index 2 appears to be Contradiction.
-        entailment_scores = probs[:, 0] 
+        # Only the entailment column of the softmax is used: p0 = 1 / sum_j exp(l_j - l_0).
+        # Overflow to inf is harmless here (it just means p0 -> 0).
+        with np.errstate(over="ignore"):
+            entailment_scores = 1.0 / np.exp(final_logits - final_logits[:, :1]).sum(axis=1)
         
         return entailment_scores
 
@@ -159,3 +280,6 @@ class NLIClassifier:
             return "Unknown"
 
 FallbackHandler = NLIClassifier
+
+# Shared by the NLI voter and the processor fallback so the model is only loaded once
+nli_classifier = NLIClassifier()
@@ -7,6 +7,9 @@ Incoming files are matched to folders by comparing their embedding to folder cen
 import os
 import time
 import json
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Callable
@@ -16,6 +19,17 @@ from src.utils.logger import logger
 from src.infrastructure.embeddings.sentence_transformer import model_manager
 from src.services.enrichment import enricher
 from src.core.models import FolderCluster, MIN_FILES_FOR_CENTROID
+from src.core.events import event_broker
+
+# orjson is optional; a faster drop-in for the index manifest
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _load_json(path: Path):
+    data = path.read_bytes()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
 
 # Supported file extensions for content embedding
 SUPPORTED_EXTENSIONS = {
@@ -37,12 +51,27 @@ class AtlasService:
     """
     
     def __init__(self):
-        self.index_file = Path.home() / ".sortify" / "atlas_v2.json"
+        # v3: small JSON manifest of paths + one .npz with the stacked vectors
+        self.index_file = Path.home() / ".sortify" / "atlas_v3.json"
+        self.matrix_file = self.index_file.with_suffix(".npz")
+        self.legacy_index_file = Path.home() / ".sortify" / "atlas_v2.json"
         self.clusters: Dict[str, FolderCluster] = {}
         
         # Computed embedding matrix for fast search
         self._embedding_matrix: Optional[np.ndarray] = None
         self._path_index: List[str] = []
+        self._row_by_path: Dict[str, int] = {}
+        # Guards clusters and the search index against concurrent processor workers
+        self._lock = threading.RLock()
+        
+        # Per-move updates patch the index in place and mark it dirty; a background
+        # writer coalesces the save once things have been quiet for flush_delay seconds
+        self.flush_delay = 2.0
+        self._dirty = threading.Event()
+        self._stopping = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        # Serializes save() so the writer thread and shutdown never share the tmp files
+        self._save_lock = threading.Lock()
         
         # Config
         self.scan_roots = [
@@ -51,6 +80,11 @@ class AtlasService:
             Path.home() / "Downloads"
         ]
         self.max_depth = 4
+        # Phase 3 fan-out: text extraction is I/O-bound, encoding is batched across folders.
+        # Capped like the processor pool (min(4, cpu)): each extractor holds its own buffers
+        # and the scan overlaps the embedding model warm-up
+        self.scan_workers = min(4, os.cpu_count() or 1)
+        self.scan_encode_batch = 64
         self.ignore_folders = {
             ".git", "node_modules", "venv", "__pycache__", ".sortify", 
             "build", "dist", "tmp", "temp", "logs", "cache", ".cache",
@@ -73,7 +107,7 @@ class AtlasService:
 
     def initialize(self):
         """Load existing index or perform initial scan."""
-        if self.index_file.exists():
+        if self.index_file.exists() or self.legacy_index_file.exists():
             self.load()
         else:
             self.scan()
@@ -115,9 +149,26 @@ class AtlasService:
         # Phase 3: Compute content centroids by sampling files
         self._report_progress(0, total_folders, "Computing folder content centroids...")
         
-        for idx, folder_path in enumerate(discovered_folders):
-            self._report_progress(idx + 1, total_folders, f"Scanning {Path(folder_path).name}")
-            self._compute_folder_centroid(folder_path, model)
+        pending: List[Tuple[str, List[str]]] = []
+        pending_texts = 0
+        with ThreadPoolExecutor(max_workers=self.scan_workers, thread_name_prefix="sortify-atlas-scan") as pool:
+            futures = {pool.submit(self._gather_folder_texts, p): p for p in discovered_folders}
+            for idx, future in enumerate(as_completed(futures), start=1):
+                folder_path = futures[future]
+                self._report_progress(idx, total_folders, f"Scanning {Path(folder_path).name}")
+                try:
+                    texts = future.result()
+                except Exception as e:
+                    logger.debug(f"Atlas: Failed to scan {folder_path}: {e}")
+                    continue
+                if texts:
+                    pending.append((folder_path, texts))
+                    pending_texts += len(texts)
+                if pending_texts >= self.scan_encode_batch:
+                    self._assign_centroids(pending, model)
+                    pending, pending_texts = [], 0
+        if pending:
+            self._assign_centroids(pending, model)
         
         # Build search index
         self._rebuild_search_index()
@@ -135,40 +186,48 @@ class AtlasService:
             if not root.exists():
                 continue
             
-            root_depth = str(root).count(os.sep)
+            # Resolve the root once; children are real directories (symlinks are not
+            # followed), so joining names onto it yields the same resolved paths
+            root_str = str(root.resolve())
+            root_name = os.path.basename(root_str)
+            if root_name.startswith(".") or root_name.lower() in self.ignore_folders:
+                continue
             
-            for current, dirs, files in os.walk(root):
-                current_path = Path(current).resolve()
-                depth = str(current).count(os.sep) - root_depth
+            # Breadth-first walk with explicit depth; DirEntry.is_dir reuses the readdir type info
+            pending = deque([(root_str, 0)])
+            while pending:
+                current, depth = pending.popleft()
                 
-                # Pruning
-                if depth > self.max_depth:
-                    dirs[:] = []
-                    continue
+                # Index folder (skip roots themselves)
+                if depth > 0:
+                    discovered.append(current)
                 
-                # Ignore hidden/system folders
-                if current_path.name.startswith(".") or current_path.name.lower() in self.ignore_folders:
-                    dirs[:] = []
+                # Pruning
+                if depth >= self.max_depth:
                     continue
                 
-                # Prevent recursion into nested system folders
-                if depth > 0 and current_path.name.lower() in scan_root_names:
-                    dirs[:] = []
+                try:
+                    with os.scandir(current) as entries:
+                        children = [e for e in entries if e.is_dir(follow_symlinks=False)]
+                except OSError:
                     continue
                 
-                # Index folder (skip roots themselves)
-                if depth > 0:
-                    discovered.append(str(current_path))
+                for entry in children:
+                    name = entry.name
+                    name_lower = name.lower()
+                    # Ignore hidden/system folders and nested copies of the scan roots
+                    if name.startswith(".") or name_lower in self.ignore_folders or name_lower in scan_root_names:
+                        continue
+                    pending.append((entry.path, depth + 1))
         
         return discovered
 
-    def _compute_folder_centroid(self, folder_path: str, model):
+    def _gather_folder_texts(self, folder_path: str) -> List[str]:
         """
-        Compute centroid for a folder by sampling its files.
+        Extract text from a sample of a folder's files (I/O only, safe to run in parallel).
         Only processes files with supported extensions.
         """
         folder = Path(folder_path)
-        cluster = self.clusters[folder_path]
         
         # Get supported files (non-recursive, just immediate children)
         files = [
@@ -176,46 +235,59 @@ class AtlasService:
             if f.is_file() and f.suffix.lower() in SUPPORTED_EXTENSIONS
         ]
         
-        if not files:
-            return
-        
         # Sample up to 10 files for centroid computation
-        sample_files = files[:10]
-        embeddings = []
-        
-        for file_path in sample_files:
+        texts = []
+        for file_path in files[:10]:
             try:
                 # Use enricher to extract text
                 ctx = enricher.enrich(file_path)
-                if ctx.text and len(ctx.text.strip()) > 20:
+                if ctx.has_body:
                     # Truncate to reasonable length
-                    text = ctx.text[:1000]
-                    emb = model.encode(text, show_progress_bar=False)
-                    embeddings.append(emb)
+                    texts.append(ctx.text[:1000])
             except Exception as e:
-                logger.debug(f"Atlas: Failed to embed {file_path.name}: {e}")
+                logger.debug(f"Atlas: Failed to read {file_path.name}: {e}")
                 continue
         
-        if embeddings:
-            # Compute centroid as average
-            cluster.centroid = np.mean(embeddings, axis=0).astype(np.float32)
-            cluster.n_files = len(embeddings)
+        return texts
+
+    def _assign_centroids(self, batch: List[Tuple[str, List[str]]], model):
+        """Embed several folders' texts in one encode call and set each centroid to its mean."""
+        texts = [t for _, folder_texts in batch for t in folder_texts]
+        try:
+            embeddings = model.encode(texts, batch_size=32, show_progress_bar=False)
+        except Exception as e:
+            logger.debug(f"Atlas: Failed to embed {len(batch)} folders: {e}")
+            return
+        
+        # Texts are grouped by folder, so each centroid is a segment sum / count
+        counts = np.array([len(folder_texts) for _, folder_texts in batch])
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.add.reduceat(embeddings, starts, axis=0)
+        for (folder_path, _), total, n in zip(batch, sums, counts):
+            cluster = self.clusters[folder_path]
+            cluster.centroid = (total / n).astype(np.float32)
+            cluster.n_files = int(n)
 
     def _rebuild_search_index(self):
         """Build numpy matrix for fast similarity search."""
-        self._path_index = []
+        path_index = []
         embeddings = []
         
         for path, cluster in self.clusters.items():
             emb = cluster.get_effective_embedding()
             if emb is not None:
-                self._path_index.append(path)
+                path_index.append(path)
                 embeddings.append(emb)
         
-        if embeddings:
-            self._embedding_matrix = np.vstack(embeddings).astype(np.float32)
-        else:
-            self._embedding_matrix = None
+        # Effective embeddings are unit length, so queries need a single matrix-vector product
+        embedding_matrix = np.vstack(embeddings) if embeddings else None
+        
+        with self._lock:
+            self._path_index = path_index
+            self._row_by_path = {path: row for row, path in enumerate(path_index)}
+            self._embedding_matrix = embedding_matrix
+        
+        event_broker.ATLAS_UPDATED.send(self)
 
     def find_best_folder(
         self, 
@@ -234,92 +306,217 @@ class AtlasService:
         Returns:
             (matched_folder_path, confidence_score) or (None, 0.0)
         """
-        if self._embedding_matrix is None or len(self._path_index) == 0:
-            return None, 0.0
-        
-        # Get query embedding
-        if file_embedding is not None:
-            query_vec = np.array(file_embedding, dtype=np.float32)
-        elif fallback_text:
-            model = model_manager.get_embedding_model()
-            query_vec = model.encode(fallback_text)
-        else:
+        scored = self._score_folders(file_embedding, fallback_text)
+        if scored is None:
             return None, 0.0
-        
-        # Ensure 1D
-        if query_vec.ndim > 1:
-            query_vec = query_vec.flatten()
-        
-        # Cosine similarity (vectors are normalized by sentence-transformers)
-        # For non-normalized, we'd need: cos_sim = dot / (norm_a * norm_b)
-        similarities = np.dot(self._embedding_matrix, query_vec)
-        norms = np.linalg.norm(self._embedding_matrix, axis=1) * np.linalg.norm(query_vec)
-        similarities = similarities / (norms + 1e-8)
+        similarities, path_index = scored
         
         best_idx = np.argmax(similarities)
         best_score = float(similarities[best_idx])
         
         if best_score >= threshold:
-            match_path = self._path_index[best_idx]
+            match_path = path_index[best_idx]
             match_name = Path(match_path).name
             logger.info(f"Atlas: Match '{fallback_text or 'embedding'}' → '{match_name}' (score: {best_score:.3f})")
             return Path(match_path), best_score
         
         return None, best_score
 
-    def update_cluster(self, folder_path: Path, file_embedding: np.ndarray):
+    def find_top_k(
+        self,
+        file_embedding: np.ndarray = None,
+        fallback_text: str = None,
+        k: int = 5
+    ) -> List[Tuple[Path, float]]:
         """
-        Update a folder's centroid after placing a new file.
-        Called by ExecutionService after successful move.
+        The k most similar folders, best first, as (folder_path, score).
+        Selection is an O(N) argpartition; only the k winners are sorted.
         """
-        path_str = str(folder_path)
+        scored = self._score_folders(file_embedding, fallback_text)
+        if scored is None or k <= 0:
+            return []
+        similarities, path_index = scored
+        
+        k = min(k, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [(Path(path_index[i]), float(similarities[i])) for i in top]
+
+    def _score_folders(self, file_embedding: np.ndarray = None, fallback_text: str = None) -> Optional[Tuple[np.ndarray, List[str]]]:
+        """Cosine similarity of the query against every indexed folder, with the matching path list."""
+        with self._lock:
+            embedding_matrix, path_index = self._embedding_matrix, self._path_index
         
-        if path_str not in self.clusters:
-            # New folder - create cluster
+        if embedding_matrix is None or len(path_index) == 0:
+            return None
+        
+        # Get query embedding
+        if file_embedding is not None:
+            query_vec = np.asarray(file_embedding, dtype=np.float32)
+        elif fallback_text:
             model = model_manager.get_embedding_model()
-            name_emb = model.encode(folder_path.name)
-            self.clusters[path_str] = FolderCluster(
-                path=path_str,
-                name_embedding=name_emb
-            )
+            query_vec = model.encode(fallback_text)
+        else:
+            return None
         
-        cluster = self.clusters[path_str]
-        cluster.update_centroid(file_embedding)
+        # Ensure 1D (a view when possible; the query is never modified in place)
+        query_vec = query_vec.reshape(-1)
         
-        # Rebuild index and save (could be optimized to batch)
-        self._rebuild_search_index()
-        self.save()
+        # Cosine similarity: matrix rows are unit length, so only the query norm is needed.
+        # The matrix stays float32: NumPy has no BLAS path for float16, so a half-precision
+        # GEMV runs ~25x slower here despite moving half the bytes.
+        similarities = embedding_matrix @ query_vec
+        similarities /= np.linalg.norm(query_vec) + 1e-8
+        return similarities, path_index
+
+    def update_cluster(self, folder_path: Path, file_embedding: np.ndarray):
+        """
+        Update a folder's centroid after placing a new file.
+        Called by ExecutionService after successful move.
+        """
+        path_str = str(folder_path)
         
+        with self._lock:
+            if path_str not in self.clusters:
+                # New folder - create cluster
+                model = model_manager.get_embedding_model()
+                name_emb = model.encode(folder_path.name)
+                self.clusters[path_str] = FolderCluster(
+                    path=path_str,
+                    name_embedding=name_emb
+                )
+            
+            cluster = self.clusters[path_str]
+            was_centroid = cluster.n_files >= MIN_FILES_FOR_CENTROID
+            cluster.update_centroid(file_embedding)
+            
+            # Patch the index instead of rebuilding it: overwrite this folder's row (O(D)),
+            # or append one for a folder that wasn't indexed yet
+            emb = cluster.get_effective_embedding()
+            row = self._row_by_path.get(path_str)
+            # A new row, or a row switching from name to centroid, can change which folder
+            # a text-only lookup picks; ordinary centroid drift is left to the next flush
+            index_changed = False
+            if emb is None:
+                pass
+            elif row is not None:
+                self._embedding_matrix[row] = emb
+                index_changed = not was_centroid and cluster.n_files >= MIN_FILES_FOR_CENTROID
+            else:
+                index_changed = True
+                # New objects, so readers holding the previous snapshot stay consistent
+                matrix = self._embedding_matrix
+                self._embedding_matrix = emb[None, :].copy() if matrix is None else np.vstack([matrix, emb])
+                self._path_index = self._path_index + [path_str]
+                self._row_by_path[path_str] = len(self._path_index) - 1
+        
+        if index_changed:
+            event_broker.ATLAS_UPDATED.send(self)
+        self._mark_dirty()
         logger.debug(f"Atlas: Updated cluster '{folder_path.name}' (n={cluster.n_files})")
 
+    def _mark_dirty(self):
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._writer_loop, daemon=True, name="sortify-atlas-writer")
+                    self._writer.start()
+        self._dirty.set()
+
+    def _writer_loop(self):
+        while True:
+            self._dirty.wait()
+            if self._stopping.is_set():
+                return
+            # Debounce: keep waiting while updates are still arriving, but never
+            # hold a steady stream of moves back for more than a few windows
+            deadline = time.monotonic() + 5 * self.flush_delay
+            self._dirty.clear()
+            while self._dirty.wait(self.flush_delay) and time.monotonic() < deadline:
+                if self._stopping.is_set():
+                    return
+                self._dirty.clear()
+            self._dirty.clear()
+            self.flush()
+
+    def flush(self):
+        """Announce the patched index and persist the clusters."""
+        event_broker.ATLAS_UPDATED.send(self)
+        self.save()
+
+    def close(self):
+        """Stop the background writer and persist whatever it had pending."""
+        self._stopping.set()
+        self._dirty.set()
+        writer = self._writer
+        if writer is not None and writer is not threading.current_thread():
+            writer.join()
+        self.flush()
+
     def save(self):
         """Persist index to disk."""
         try:
             self.index_file.parent.mkdir(parents=True, exist_ok=True)
-            data = {
-                "version": 2,
-                "clusters": {path: c.to_dict() for path, c in self.clusters.items()}
-            }
-            with open(self.index_file, "w") as f:
-                json.dump(data, f)
+            dim = model_manager.get_embedding_model().get_sentence_embedding_dimension()
+            # One save at a time: the writer thread and shutdown both land here
+            with self._save_lock:
+                # Snapshot under the lock; the disk write doesn't need to block lookups
+                with self._lock:
+                    paths = list(self.clusters)
+                    names = np.zeros((len(paths), dim), dtype=np.float32)
+                    centroids = np.zeros((len(paths), dim), dtype=np.float32)
+                    has_name = np.zeros(len(paths), dtype=bool)
+                    has_centroid = np.zeros(len(paths), dtype=bool)
+                    n_files = np.zeros(len(paths), dtype=np.int32)
+                    for row, path in enumerate(paths):
+                        cluster = self.clusters[path]
+                        if cluster.name_embedding is not None:
+                            names[row] = np.ravel(cluster.name_embedding)
+                            has_name[row] = True
+                        if cluster.centroid is not None:
+                            centroids[row] = np.ravel(cluster.centroid)
+                            has_centroid[row] = True
+                        n_files[row] = cluster.n_files
+            
+                # Write both files aside and swap them in so a crash never leaves a torn index
+                matrix_tmp = self.matrix_file.with_name(self.matrix_file.name + ".tmp")
+                with open(matrix_tmp, "wb") as f:
+                    np.savez(f, names=names, centroids=centroids, has_name=has_name,
+                             has_centroid=has_centroid, n_files=n_files)
+                index_tmp = self.index_file.with_name(self.index_file.name + ".tmp")
+                manifest = {"version": 3, "paths": paths}
+                with open(index_tmp, "wb") as f:
+                    f.write(orjson.dumps(manifest) if orjson is not None else json.dumps(manifest).encode())
+                os.replace(matrix_tmp, self.matrix_file)
+                os.replace(index_tmp, self.index_file)
         except Exception as e:
             logger.error(f"Atlas save failed: {e}")
 
     def load(self):
         """Load index from disk."""
         try:
-            with open(self.index_file, "r") as f:
-                data = json.load(f)
-            
-            version = data.get("version", 1)
-            if version < 2:
-                logger.info("Atlas: Old index version detected. Rescanning...")
-                self.scan()
+            if not self.index_file.exists():
+                self._load_legacy()
                 return
             
+            paths = _load_json(self.index_file).get("paths", [])
+            with np.load(self.matrix_file) as arrays:
+                names, centroids = arrays["names"], arrays["centroids"]
+                has_name, has_centroid = arrays["has_name"], arrays["has_centroid"]
+                n_files = arrays["n_files"]
+            
+            if len(names) != len(paths):
+                raise ValueError(f"manifest lists {len(paths)} folders but matrix has {len(names)} rows")
+            
+            # Rows are views into the loaded arrays; copy centroids since they are updated in place
             self.clusters = {
-                path: FolderCluster.from_dict(c) 
-                for path, c in data.get("clusters", {}).items()
+                path: FolderCluster(
+                    path=path,
+                    centroid=centroids[row].copy() if has_centroid[row] else None,
+                    name_embedding=names[row] if has_name[row] else None,
+                    n_files=int(n_files[row])
+                )
+                for row, path in enumerate(paths)
             }
             
             self._rebuild_search_index()
@@ -329,6 +526,25 @@ class AtlasService:
             logger.error(f"Atlas load failed: {e}. Rescanning...")
             self.scan()
 
+    def _load_legacy(self):
+        """Load a v2 JSON index and rewrite it in the v3 layout."""
+        data = _load_json(self.legacy_index_file)
+        
+        version = data.get("version", 1)
+        if version < 2:
+            logger.info("Atlas: Old index version detected. Rescanning...")
+            self.scan()
+            return
+        
+        self.clusters = {
+            path: FolderCluster.from_dict(c) 
+            for path, c in data.get("clusters", {}).items()
+        }
+        
+        self._rebuild_search_index()
+        self.save()
+        logger.info(f"Atlas: Migrated {len(self.clusters)} clusters from the v2 index.")
+
 
 # Global Instance
 atlas = AtlasService()
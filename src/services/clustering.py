@@ -1,7 +1,8 @@
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-from collections import deque
+from collections import Counter, deque
+import threading
 from src.utils.logger import logger
 
 @dataclass
@@ -15,39 +16,51 @@ class SessionManager:
     Maintains a 'Short-term Memory' of recent file operations.
     Goal: Identify 'Sessions' (e.g. User downloading 5 Physics papers in 3 mins).
     """
-    def __init__(self, window_minutes: int = 5):
+    def __init__(self, window_minutes: int = 5, max_events: int = 50):
         self.window = timedelta(minutes=window_minutes)
-        # We store events chronologically
-        self.history: deque[FileEvent] = deque(maxlen=50) 
+        self.max_events = max_events
+        # We store events chronologically, with a live per-category tally of them
+        self.history: deque[FileEvent] = deque()
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
         
     def add_event(self, path: str, category: str):
         if category == "Unknown":
             return
         event = FileEvent(path, category)
-        self.history.append(event)
+        with self._lock:
+            if len(self.history) >= self.max_events:
+                self._drop_oldest()
+            self.history.append(event)
+            self._counts[category] += 1
+            self._expire(event.timestamp)
+
+    def _drop_oldest(self):
+        # Caller holds _lock
+        old = self.history.popleft()
+        self._counts[old.category] -= 1
+        if not self._counts[old.category]:
+            del self._counts[old.category]
+
+    def _expire(self, now: datetime):
+        # Caller holds _lock; events are chronological so expired ones sit at the left
+        while self.history and now - self.history[0].timestamp >= self.window:
+            self._drop_oldest()
         
     def get_current_session_context(self) -> Dict[str, float]:
         """
         Returns a distribution of categories from the last 'window' minutes.
         e.g. {"Documents": 0.8, "Images": 0.2}
         """
-        now = datetime.now()
-        recent_events = [
-            e for e in self.history 
-            if now - e.timestamp < self.window
-        ]
-        
-        if not recent_events:
-            return {}
-            
-        counts = {}
-        for e in recent_events:
-            counts[e.category] = counts.get(e.category, 0) + 1
+        with self._lock:
+            self._expire(datetime.now())
+            total = len(self.history)
+            if not total:
+                return {}
+            distribution = {cat: count / total for cat, count in self._counts.items()}
             
-        total = len(recent_events)
-        distribution = {cat: count / total for cat, count in counts.items()}
         dominant = max(distribution, key=distribution.get)
-        logger.debug(f"Session Context: {len(recent_events)} files recently. Dominant: {dominant} ({distribution[dominant]:.2f})")
+        logger.debug(f"Session Context: {total} files recently. Dominant: {dominant} ({distribution[dominant]:.2f})")
         
         return distribution
 
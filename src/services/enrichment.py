@@ -41,6 +41,7 @@ class EnrichmentService:
                  logger.info(f"OCR recovered {len(text)} chars from {path.name}")
         
         ctx.text = text
+        ctx.prepare()
         return ctx
 
 enricher = EnrichmentService()
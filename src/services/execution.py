@@ -1,5 +1,6 @@
+import errno
+import os
 import shutil
-import json
 import numpy as np
 from pathlib import Path
 from datetime import datetime
@@ -12,6 +13,7 @@ from src.core.events import event_broker
 from src.infrastructure.database.engine import get_session
 from src.infrastructure.database.models import Transaction, FileIndex
 from src.utils.logger import logger
+from src.utils.system import next_free_version
 from src.core.classification.classifier import classifier
 
 class ExecutionService(BaseService):
@@ -37,7 +39,8 @@ class ExecutionService(BaseService):
                 embedding = metadata.get("embedding")
                 if embedding is not None:
                     try:
-                        file_embedding = np.array(embedding, dtype=np.float32)
+                        file_embedding = np.array(embedding, dtype=np.float32).reshape(-1)
+                        file_embedding /= np.linalg.norm(file_embedding) + 1e-8
                         atlas.update_cluster(destination.parent, file_embedding)
                     except Exception as e:
                         logger.debug(f"Failed to update Atlas cluster: {e}")
@@ -47,75 +50,93 @@ class ExecutionService(BaseService):
             event_broker.ACTION_FAILED.send(self, path=path, error=str(e))
 
     def execute_move(self, src: Path, dest: Path, file_hash: str, metadata: dict = None):
-        # 1. Resolve Destination Collision
+        # 1. Resolve Destination Collision (reserves final_dest as an empty placeholder)
         final_dest = self._resolve_collision(dest)
         
         # 2. Phase 1: Prepare (Write Intent)
         tx_id = str(uuid.uuid4())
         
-        with get_session() as session:
-            # Create Transaction Record
-            tx = Transaction(
-                id=tx_id,
-                src_path=str(src),
-                dest_path=str(final_dest),
-                action_type="move",
-                status="pending",
-                rollback_data_json=json.dumps({"original_path": str(src)})
-            )
-            session.add(tx)
+        try:
+            with get_session() as session:
+                # Create Transaction Record
+                tx = Transaction(
+                    id=tx_id,
+                    src_path=str(src),
+                    dest_path=str(final_dest),
+                    action_type="move",
+                    status="pending"
+                )
+                # Serialized by the model's setter (orjson when available)
+                tx.rollback_data = {"original_path": str(src)}
+                session.add(tx)
             
-            # Create/Update FileIndex (mark as pending?)
-            # We update FileIndex AFTER success, or here? 
-            # Let's insert/update FileIndex at the end.
+                # Create/Update FileIndex (mark as pending?)
+                # We update FileIndex AFTER success, or here? 
+                # Let's insert/update FileIndex at the end.
             
-            session.commit()
+                session.commit()
             
-            try:
-                # 3. Phase 2: Commit (OS Action)
-                final_dest.parent.mkdir(parents=True, exist_ok=True)
-                shutil.move(str(src), str(final_dest))
+                try:
+                    # 3. Phase 2: Commit (OS Action)
+                    # Same filesystem (the common case): one atomic rename over the placeholder
+                    try:
+                        os.replace(src, final_dest)
+                    except OSError as e:
+                        if e.errno != errno.EXDEV:
+                            raise
+                        shutil.move(str(src), str(final_dest))
                 
-                # 4. Finalize DB
-                tx.status = "committed"
-                session.add(tx)
+                    # 4. Finalize DB
+                    tx.status = "committed"
+                    session.add(tx)
                 
-                # Update FileIndex
-                # Check if exists
-                existing_idx = session.get(FileIndex, file_hash)
-                if not existing_idx:
-                    existing_idx = FileIndex(file_hash=file_hash, current_path=str(final_dest))
-                else:
-                    existing_idx.current_path = str(final_dest)
-                    existing_idx.last_seen = datetime.now()
-                    existing_idx.status = "processed"
+                    # Update FileIndex
+                    # Check if exists
+                    existing_idx = session.get(FileIndex, file_hash)
+                    if not existing_idx:
+                        existing_idx = FileIndex(file_hash=file_hash, current_path=str(final_dest))
+                    else:
+                        existing_idx.current_path = str(final_dest)
+                        existing_idx.last_seen = datetime.now()
+                        existing_idx.status = "processed"
                 
-                session.add(existing_idx)
-                session.commit()
+                    session.add(existing_idx)
+                    session.commit()
                 
-                logger.info(f"Moved: {src.name} -> {final_dest}")
-                event_broker.ACTION_COMPLETED.send(self, path=src, new_path=final_dest)
+                    logger.info(f"Moved: {src.name} -> {final_dest}")
+                    event_broker.ACTION_COMPLETED.send(self, path=src, new_path=final_dest)
 
-            except Exception as move_error:
-                # Rollback!
-                session.refresh(tx)
-                tx.status = "failed"
-                session.add(tx)
-                session.commit()
-                raise move_error
+                except Exception as move_error:
+                    # Rollback! tx is still attached, so no refresh is needed; the
+                    # rollback only clears a failed flush (no-op when nothing is pending)
+                    session.rollback()
+                    tx.status = "failed"
+                    session.commit()
+                    raise move_error
+        except Exception:
+            # Drop the placeholder if the file never landed on it
+            if src.exists():
+                final_dest.unlink(missing_ok=True)
+            raise
 
     def _resolve_collision(self, dest: Path) -> Path:
         """
         Renames file if destination exists.
         file.pdf -> file_v1.pdf, file_v2.pdf...
+        The chosen path is claimed with O_CREAT | O_EXCL so a concurrent move
+        can't pick the same name between this check and the rename.
         """
-        if not dest.exists():
-            return dest
-            
-        counter = 1
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        parent, stem, suffix = dest.parent, dest.stem, dest.suffix
+
+        def versioned(n: int) -> Path:
+            return dest if n == 0 else parent / f"{stem}_v{n}{suffix}"
+
+        counter = 0
         while True:
-            new_name = f"{dest.stem}_v{counter}{dest.suffix}"
-            new_dest = dest.parent / new_name
-            if not new_dest.exists():
-                return new_dest
-            counter += 1
+            candidate = versioned(counter)
+            try:
+                os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return candidate
+            except FileExistsError:
+                counter = next_free_version(versioned, counter + 1)
@@ -1,39 +1,151 @@
+import atexit
+import errno
+import os
 import shutil
 import json
 import time
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from typing import List, Dict, Optional, Set
 from src.config.settings import settings
 from src.utils.logger import logger
 from src.i18n.strings import Strings
+from src.utils.system import next_free_version
+
+# orjson is optional; a faster drop-in for the transaction log
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _dumps(obj) -> bytes:
+    return orjson.dumps(obj) if orjson is not None else json.dumps(obj).encode()
+
+def _loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
 
 class Executor:
     def __init__(self):
-        self.transaction_log_file = settings.DB_FILE.parent / "transactions.json"
+        # Serializes destination resolution + move + log append across processor workers
+        self._lock = threading.RLock()
+
+        # JSON Lines, append-only: one record per move, plus {"action": "undo"} tombstones
+        self.transaction_log_file = settings.DB_FILE.parent / "transactions.jsonl"
+        self.legacy_log_file = settings.DB_FILE.parent / "transactions.json"
         self.transactions: List[Dict] = []
+        # Long-lived buffered append handle, opened on first write; flushed every
+        # log_flush_every records, on shutdown and at exit
+        self._log_fp = None
+        self._writes_since_flush = 0
+        self.log_flush_every = 16
         self._load_transactions()
+        atexit.register(self.close_log)
         
         # Track recently moved files to prevent re-processing (cooldown)
-        self._recently_moved: Dict[str, float] = {}  # path -> timestamp
+        # path -> timestamp, oldest first, so expiry only ever pops from the front.
+        # Each move is stored under its absolute and its resolved spelling, so
+        # lookups never have to resolve() (an lstat per path component).
+        self._recently_moved: "OrderedDict[str, float]" = OrderedDict()
         self._cooldown_seconds = 10.0  # Ignore files for 10 seconds after move
+        self._recently_moved_cap = 1024
+        self._recent_lock = threading.Lock()
 
     def _load_transactions(self):
-        if self.transaction_log_file.exists():
-            try:
-                with open(self.transaction_log_file, "r") as f:
-                    self.transactions = json.load(f)
-            except Exception as e:
-                logger.error(f"Failed to load transaction log: {e}")
-                self.transactions = []
+        if not self.transaction_log_file.exists():
+            self._migrate_legacy_log()
+            return
+
+        compact = False
+        try:
+            with open(self.transaction_log_file, "rb") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = _loads(line)
+                    except ValueError:
+                        # Torn write from a crash mid-append
+                        logger.warning("Skipping unreadable transaction log line")
+                        compact = True
+                        continue
+                    if record.get("action") == "undo":
+                        if self.transactions:
+                            self.transactions.pop()
+                        compact = True
+                    else:
+                        self.transactions.append(record)
+        except Exception as e:
+            logger.error(f"Failed to load transaction log: {e}")
+            self.transactions = []
+            return
+
+        # Fold tombstones away once per start so the log doesn't grow with undos
+        if compact:
+            self._save_transactions()
+
+    def _migrate_legacy_log(self):
+        """Converts the old single-document transactions.json to JSON Lines."""
+        if not self.legacy_log_file.exists():
+            return
+        try:
+            self.transactions = _loads(self.legacy_log_file.read_bytes())
+            self._save_transactions()
+            self.legacy_log_file.unlink()
+            logger.info(f"Migrated {len(self.transactions)} transactions to {self.transaction_log_file.name}")
+        except Exception as e:
+            logger.error(f"Failed to migrate transaction log: {e}")
+            self.transactions = []
 
     def _save_transactions(self):
+        """Rewrites the whole log; only used for migration and compaction."""
+        # The rewrite replaces the file, so an open append handle would point at the old one
+        self.close_log()
         try:
             self.transaction_log_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.transaction_log_file, "w") as f:
-                json.dump(self.transactions, f, indent=2)
+            tmp = self.transaction_log_file.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                f.writelines(_dumps(tx) + b"\n" for tx in self.transactions)
+            os.replace(tmp, self.transaction_log_file)
         except Exception as e:
             logger.error(f"Failed to save transaction log: {e}")
 
+    def _append_transaction(self, record: Dict):
+        with self._lock:
+            try:
+                if self._log_fp is None:
+                    self.transaction_log_file.parent.mkdir(parents=True, exist_ok=True)
+                    self._log_fp = open(self.transaction_log_file, "ab", buffering=64 * 1024)
+                self._log_fp.write(_dumps(record) + b"\n")
+                self._writes_since_flush += 1
+                if self._writes_since_flush >= self.log_flush_every:
+                    self._log_fp.flush()
+                    self._writes_since_flush = 0
+            except Exception as e:
+                logger.error(f"Failed to append to transaction log: {e}")
+
+    def close_log(self):
+        """Flushes and closes the append handle; the next append reopens it."""
+        with self._lock:
+            if self._log_fp is None:
+                return
+            try:
+                self._log_fp.close()
+            except Exception as e:
+                logger.error(f"Failed to flush transaction log: {e}")
+            self._log_fp = None
+            self._writes_since_flush = 0
+
+    @staticmethod
+    def _move(src: Path, dest: Path):
+        """rename(2) when src and dest share a filesystem (no bytes copied), else copy + delete."""
+        try:
+            os.replace(src, dest)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(str(src), str(dest))
+
     def _get_safe_dest(self, dest: Path) -> Path:
         """
         Returns a unique destination path to avoid overwriting.
@@ -45,13 +157,12 @@ class Executor:
         stem = dest.stem
         suffix = dest.suffix
         parent = dest.parent
-        counter = 2
-        
-        while True:
-            new_dest = parent / f"{stem}_v{counter}{suffix}"
-            if not new_dest.exists():
-                return new_dest
-            counter += 1
+
+        def versioned(n: int) -> Path:
+            return parent / f"{stem}_v{n}{suffix}"
+
+        # Gallop + bisect: O(log n) stats instead of one per existing version
+        return versioned(next_free_version(versioned, 2))
 
     def safe_move(self, src: Path, dest_folder: Path, new_name: Optional[str] = None) -> bool:
         """
@@ -71,24 +182,36 @@ class Executor:
                 logger.info(f"[DRY RUN] Would move '{src}' to '{final_dest}'")
                 return True
 
-            # Create destination folder
-            dest_folder.mkdir(parents=True, exist_ok=True)
-            
-            # Perform Move
-            shutil.move(str(src), str(final_dest))
-            logger.info(f"Moved '{src.name}' to '{final_dest}'")
-            
-            # Track this destination to prevent re-processing
-            self._recently_moved[str(final_dest.resolve())] = time.time()
-            
-            # Log Transaction
-            self.transactions.append({
-                "action": "move",
-                "src": str(src), # Original location (now empty)
-                "dest": str(final_dest), # New location
-                "timestamp": time.time()
-            })
-            self._save_transactions()
+            with self._lock:
+                # Re-resolve under the lock so concurrent moves can't pick the same name
+                final_dest = self._get_safe_dest(dest_folder / dest_name)
+                
+                # Create destination folder
+                dest_folder.mkdir(parents=True, exist_ok=True)
+                
+                # Perform Move
+                self._move(src, final_dest)
+                logger.info(f"Moved '{src.name}' to '{final_dest}'")
+                
+                # Track this destination to prevent re-processing
+                keys = {os.path.abspath(final_dest), str(final_dest.resolve())}
+                now = time.time()
+                with self._recent_lock:
+                    for key in keys:
+                        self._recently_moved[key] = now
+                        self._recently_moved.move_to_end(key)
+                    while len(self._recently_moved) > self._recently_moved_cap:
+                        self._recently_moved.popitem(last=False)
+                
+                # Log Transaction
+                tx = {
+                    "action": "move",
+                    "src": str(src), # Original location (now empty)
+                    "dest": str(final_dest), # New location
+                    "timestamp": time.time()
+                }
+                self.transactions.append(tx)
+                self._append_transaction(tx)
             
             return True
 
@@ -114,9 +237,9 @@ class Executor:
                 
                 if dest.exists() and not src.exists():
                     # Move back
-                    shutil.move(str(dest), str(src))
+                    self._move(dest, src)
                     logger.info(f"Undo: Moved '{dest.name}' back to '{src}'")
-                    self._save_transactions()
+                    self._append_transaction({"action": "undo", "timestamp": time.time()})
                     return True
                 else:
                     logger.warning(f"Undo failed: File state changed. Dest exists: {dest.exists()}, Src exists: {src.exists()}")
@@ -131,20 +254,14 @@ class Executor:
         Check if a file was recently moved by Sortify.
         Used to prevent re-processing files we just placed.
         """
-        resolved_path = str(file_path.resolve())
+        path = os.path.abspath(file_path)
         
-        # Cleanup old entries
+        # Expire from the oldest end; entries are in timestamp order
         current_time = time.time()
-        self._recently_moved = {
-            p: t for p, t in self._recently_moved.items() 
-            if current_time - t < self._cooldown_seconds
-        }
-        
-        if resolved_path in self._recently_moved:
-            elapsed = current_time - self._recently_moved[resolved_path]
-            if elapsed < self._cooldown_seconds:
-                return True
-        
-        return False
+        with self._recent_lock:
+            recent = self._recently_moved
+            while recent and current_time - next(iter(recent.values())) >= self._cooldown_seconds:
+                recent.popitem(last=False)
+            return path in recent
 
 executor = Executor()
@@ -1,168 +1,252 @@
 import json
+import logging
 import numpy as np
 import os
+import threading
 from pathlib import Path
-from typing import List, Tuple, Optional
-from sentence_transformers import util
+from typing import List, Set, Tuple, Optional
 from src.config.settings import settings
 from src.utils.logger import logger
 from src.infrastructure.embeddings.sentence_transformer import model_manager
 
+# orjson is optional; a faster drop-in for the metadata file
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _dumps(obj) -> bytes:
+    return orjson.dumps(obj) if orjson is not None else json.dumps(obj).encode()
+
+def _loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """C-contiguous float32 copy with unit-length rows, so cosine similarity is a plain dot product."""
+    matrix = np.array(matrix, dtype=np.float32, order="C", ndmin=2)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True).clip(min=1e-9)
+    return matrix
+
 class SemanticMemory:
     """
     Long-term memory for Sortify.
     Stores examples of (embedding, category) to allow Few-Shot learning.
     """
     def __init__(self):
-        self.memory_file = Path.home() / ".sortify" / "memory.json"
+        memory_dir = Path.home() / ".sortify"
+        # Metadata and embeddings live apart: a small JSON list plus a raw float32 matrix
+        self.meta_file = memory_dir / "memory_meta.json"
+        self.emb_file = memory_dir / "memory_emb.npy"
+        self.legacy_memory_file = memory_dir / "memory.json"
         self.max_entries = 200  # Hard cap to keep RAM flat
         self.max_text_chars = 160  # Avoid bloating serialized memory
         
-        # Structure: List of {"text": str, "category": str, "embedding": List[float]}
+        # Ring buffer: slot i of _ring holds the embedding for _slots[i] = {"text": str, "category": str}.
         # We store 'text' (keywords joined) for debugging/re-indexing if model changes.
-        self.data = []
-        self.embeddings_cache = None # Tensor
+        # float32 on purpose: NumPy has no BLAS kernel for int8, so an int8 ring scores
+        # ~7x slower than the float32 SGEMV, and at 200 x 384 the whole ring is only 300 KB
+        self._ring = None  # (max_entries, dim) float32, rows L2-normalized
+        self._slots: List[dict] = []
+        self._head = 0  # Next slot to write; once full, also the oldest entry
+        self._index = (None, ())  # (filled ring rows, categories) swapped together for readers
+        # learn() overwrites ring rows in place, so recall scores under the same lock
+        # rather than risk matching a new row under the evicted entry's category
+        self._lock = threading.Lock()
+        self._seen: Set[Tuple[str, str]] = set()  # (text, category) pairs in data, for dedup
         
         self.load()
 
     def load(self):
-        if self.memory_file.exists():
+        if not self.meta_file.exists() and self.legacy_memory_file.exists():
+            self._migrate_legacy()
+            return
+
+        data, matrix = [], None
+        if self.meta_file.exists() and self.emb_file.exists():
             try:
-                with open(self.memory_file, "r") as f:
-                    raw_data = json.load(f)
-                
-                # Proactive Pruning: Only keep entries matching current model dimension
-                try:
-                    expected_dim = model_manager.get_embedding_model().get_sentence_embedding_dimension()
-                    cleaned = []
-                    for entry in raw_data:
-                        emb = entry.get("embedding")
-                        if isinstance(emb, list) and len(emb) == expected_dim:
-                            entry["text"] = str(entry.get("text", ""))[: self.max_text_chars]
-                            cleaned.append(entry)
-                    pruned = len(raw_data) - len(cleaned)
-                    if pruned:
-                        logger.info(f"Pruned {pruned} invalid memory entries on load.")
-                    self.data = cleaned[: self.max_entries]
-                    if pruned or len(cleaned) > self.max_entries:
-                        self.save()
-                except Exception as e:
-                    logger.warning(f"Model not ready or check failed during load: {e}. Keeping raw data.")
-                    self.data = raw_data[: self.max_entries]
-
-                logger.info(f"Memory loaded: {len(self.data)} examples.")
+                data = _loads(self.meta_file.read_bytes())
+                matrix = np.load(self.emb_file)
+                if matrix.ndim != 2 or len(matrix) != len(data):
+                    raise ValueError(f"{len(data)} entries but embeddings of shape {matrix.shape}")
             except Exception as e:
                 logger.error(f"Failed to load memory: {e}")
-                self.data = []
+                data, matrix = [], None
+
+        # Proactive Pruning: embeddings from a different model dimension are useless
+        if matrix is not None and len(matrix):
+            try:
+                expected_dim = model_manager.get_embedding_model().get_sentence_embedding_dimension()
+                if matrix.shape[1] != expected_dim:
+                    logger.info(f"Pruned {len(data)} memory entries with dimension {matrix.shape[1]} on load.")
+                    data, matrix = [], None
+            except Exception as e:
+                logger.warning(f"Model not ready or check failed during load: {e}. Keeping raw data.")
+
+        if matrix is not None:
+            self._rebuild_index(data[-self.max_entries:], _normalize_rows(matrix[-self.max_entries:]))
         else:
-            self.data = []
-            
-        self._rebuild_index()
+            self._rebuild_index([], None)
+        logger.info(f"Memory loaded: {len(self.data)} examples.")
 
-    def save(self):
+    def _migrate_legacy(self):
+        """Converts the old memory.json (embeddings as nested lists) to meta + .npy."""
+        data, rows = [], []
         try:
-            self.memory_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.memory_file, "w") as f:
-                # We save embeddings as lists for JSON compatibility
-                json.dump(self.data, f)
+            raw_data = _loads(self.legacy_memory_file.read_bytes())
+            expected_dim = model_manager.get_embedding_model().get_sentence_embedding_dimension()
+            for entry in raw_data:
+                emb = entry.get("embedding")
+                if isinstance(emb, list) and len(emb) == expected_dim:
+                    data.append({"text": str(entry.get("text", ""))[: self.max_text_chars],
+                                 "category": entry["category"]})
+                    rows.append(emb)
+            pruned = len(raw_data) - len(data)
+            if pruned:
+                logger.info(f"Pruned {pruned} invalid memory entries during migration.")
         except Exception as e:
-            logger.error(f"Failed to save memory: {e}")
-
-    def _rebuild_index(self):
-        """Convert list of embeddings to a Tensor for fast search."""
-        if not self.data:
-            self.embeddings_cache = None
+            logger.error(f"Failed to migrate memory: {e}")
+            self._rebuild_index([], None)
             return
 
-        valid_embeddings = []
-        clean_data = []
-        pruned = 0
-        
-        for d in self.data:
-            emb = d.get("embedding")
-            if isinstance(emb, list) and emb and isinstance(emb[0], (int, float)):
-                valid_embeddings.append(emb)
-                clean_data.append(d)
-            else:
-                pruned += 1
+        if not rows:
+            self._rebuild_index([], None)
+        else:
+            matrix = np.asarray(rows, dtype=np.float32)
+            self._rebuild_index(data[-self.max_entries:], _normalize_rows(matrix[-self.max_entries:]))
+        self.save()
+        self.legacy_memory_file.unlink(missing_ok=True)
+        logger.info(f"Memory migrated: {len(self.data)} examples.")
 
-        if pruned:
-            logger.warning(f"Pruned {pruned} corrupted memory entries during index rebuild.")
+    @property
+    def data(self) -> List[dict]:
+        """Entries, oldest first."""
+        return self._slots[self._head:] + self._slots[:self._head]
 
-        self.data = clean_data[: self.max_entries]  # Enforce cap
+    @property
+    def embeddings_cache(self) -> Optional[np.ndarray]:
+        """Embeddings aligned with data (oldest first)."""
+        if self._ring is None or not self._slots:
+            return None
+        return np.roll(self._ring[:len(self._slots)], -self._head, axis=0)
 
-        if valid_embeddings:
-            try:
-                self.embeddings_cache = np.array(valid_embeddings[: self.max_entries], dtype=np.float32)
-            except Exception as e:
-                logger.error(f"Failed to build memory index: {e}")
-                self.embeddings_cache = None
-            else:
-                if pruned:
-                    self.save()
-        else:
-            self.embeddings_cache = None
+    def save(self):
+        try:
+            self.meta_file.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                matrix, data = self.embeddings_cache, self.data
+            if matrix is None:
+                matrix = np.empty((0, 0), dtype=np.float32)
+            # Write both to temp files first so a crash never leaves them out of step
+            emb_tmp = self.emb_file.with_suffix(".npy.tmp")
+            meta_tmp = self.meta_file.with_suffix(".json.tmp")
+            with open(emb_tmp, "wb") as f:
+                np.save(f, matrix)
+            meta_tmp.write_bytes(_dumps(data))
+            os.replace(emb_tmp, self.emb_file)
+            os.replace(meta_tmp, self.meta_file)
+        except Exception as e:
+            logger.error(f"Failed to save memory: {e}")
+
+    def _rebuild_index(self, data: List[dict], matrix: Optional[np.ndarray]):
+        """Copy entries (oldest first) and their row-normalized embeddings into a fresh ring."""
+        self._ring = None
+        self._slots = []
+        self._head = 0
+        if data and matrix is not None:
+            self._ring = np.zeros((self.max_entries, matrix.shape[1]), dtype=np.float32)
+            self._ring[:len(data)] = matrix
+            self._slots = list(data)
+            self._head = len(data) % self.max_entries
+        self._seen = {(d["text"], d["category"]) for d in self._slots}
+        self._publish()
+
+    def _publish(self):
+        n = len(self._slots)
+        self._index = (self._ring[:n], tuple(d["category"] for d in self._slots)) if n else (None, ())
 
     def learn(self, text: str, category: str, embedding: np.ndarray = None):
         """
         Add a new example to memory.
         """
+        # Stored text is truncated, so compare on the truncated form (and before encoding)
+        stored_text = str(text)[: self.max_text_chars]
+        if (stored_text, category) in self._seen:
+            return
+
         if embedding is None:
             model = model_manager.get_embedding_model()
             embedding = model.encode(text)
+        text = stored_text
 
-        for entry in self.data:
-            if entry["text"] == text and entry["category"] == category:
-                return
+        # Normalized once here rather than renormalizing the whole matrix per learn
+        row = _normalize_rows(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+        with self._lock:
+            if self._ring is None or self._ring.shape[1] != row.shape[0]:
+                if self._ring is not None:
+                    logger.warning(f"Embedding dimension changed to {row.shape[0]}; starting memory over.")
+                    self._rebuild_index([], None)
+                self._ring = np.zeros((self.max_entries, row.shape[0]), dtype=np.float32)
+
+            # Write one slot in place (drops the oldest entry once full)
+            entry = {"text": text, "category": category}
+            head = self._head
+            if len(self._slots) == self.max_entries:
+                evicted = self._slots[head]
+                self._seen.discard((evicted["text"], evicted["category"]))
+                self._slots[head] = entry
+            else:
+                self._slots.append(entry)
+            self._ring[head] = row
+            self._head = (head + 1) % self.max_entries
+            self._seen.add((text, category))
+            self._publish()
 
-        # Store as list for JSON
-        embedding_list = embedding.tolist() if hasattr(embedding, "tolist") else embedding
-        text = str(text)[: self.max_text_chars]
-        
-        # Enforce size cap (drop oldest)
-        if len(self.data) >= self.max_entries:
-            self.data = self.data[1:]
-        
-        self.data.append({
-            "text": text,
-            "category": category,
-            "embedding": embedding_list
-        })
-        
         self.save()
-        self._rebuild_index()
         logger.debug(f"Memory learned: '{text}' -> {category}")
 
     def recall(self, embedding: np.ndarray, threshold: float = 0.6) -> Tuple[Optional[str], float]:
         """
         KNN Search. Returns (category, score).
         """
-        if self.embeddings_cache is None or len(self.data) < 1:
-            return None, 0.0
+        return self.recall_batch(embedding, threshold)[0]
+
+    def recall_batch(self, embeddings: np.ndarray, threshold: float = 0.6) -> List[Tuple[Optional[str], float]]:
+        """
+        KNN Search for one or more queries with a single matrix product.
+        Returns one (category, score) per query row.
+        """
+        queries = np.asarray(embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+
+        misses = [(None, 0.0)] * len(queries)
 
-        # Compute cosine similarity against all memories
-        # embedding shape: (dim,)
-        # cache shape: (N, dim)
-        
-        # Ensure embedding is 1D array
-        query_emb = embedding
-        
         try:
-            # util.cos_sim expects tensors or ndarrays
-            hits = util.cos_sim(query_emb, self.embeddings_cache)[0]
-            
-            # Find best match
-            best_score_idx = np.argmax(hits)
-            best_score = hits[best_score_idx].item()
-            
-            if best_score > threshold:
-                category = self.data[best_score_idx]["category"]
-                logger.debug(f"Memory recall: Matched '{category}' (Score: {best_score:.2f})")
-                return category, best_score
-                
+            # Cosine similarity: memory rows are pre-normalized, so normalize the queries and dot
+            queries = _normalize_rows(queries)
+            with self._lock:
+                matrix, categories = self._index
+                if matrix is None or not categories:
+                    return misses
+                scores = matrix @ queries.T  # (N, B)
+            best_idx = scores.argmax(axis=0)
+            best_scores = scores[best_idx, np.arange(len(queries))]
+
+            results = []
+            debug = logger.isEnabledFor(logging.DEBUG)
+            for idx, best_score in zip(best_idx.tolist(), best_scores.tolist()):
+                if best_score > threshold:
+                    category = categories[idx]
+                    if debug:
+                        logger.debug(f"Memory recall: Matched '{category}' (Score: {best_score:.2f})")
+                    results.append((category, best_score))
+                else:
+                    results.append((None, 0.0))
+            return results
+
         except Exception as e:
             logger.error(f"Memory recall error: {e}")
-            
-        return None, 0.0
+
+        return misses
 
 memory = SemanticMemory()
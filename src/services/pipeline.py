@@ -2,7 +2,6 @@ import logging
 import time
 from pathlib import Path
 from typing import Dict, List, Tuple
-from concurrent.futures import ThreadPoolExecutor
 
 from src.config.settings import settings
 from src.utils.logger import logger
@@ -14,9 +13,11 @@ from src.core.classification.voters import (
     SemanticVoter, 
     HistoryVoter, 
     NLIVoter,
-    SessionVoter
+    SessionVoter,
+    run_voters
 )
 from src.services.clustering import session_manager
+from src.services.atlas import atlas
 
 class VotingEngine:
     """
@@ -31,7 +32,8 @@ class VotingEngine:
             SessionVoter()
         ]
         self.nli_voter = NLIVoter()
-        self.thread_pool = ThreadPoolExecutor(max_workers=2)  # Lower concurrency to reduce peak RAM
+        # Weights are fixed per voter; votes carry the voter name and arbitration looks it up here
+        self._weights = {v.name: float(v.weight) for v in (*self.voters, self.nli_voter)}
 
     def process_file(self, file_path: Path) -> dict:
         start_time = time.time()
@@ -41,26 +43,21 @@ class VotingEngine:
         context = enricher.enrich(file_path)
         
         # 1.5 Compute file embedding for Atlas cluster matching
-        file_embedding = None
-        if context.text and len(context.text.strip()) > 20:
+        if context.has_body:
             try:
                 model = model_manager.get_embedding_model()
-                file_embedding = model.encode(context.text[:512])
+                context.embedding = model.encode(context.text_500)
             except Exception as e:
                 logger.debug(f"Failed to compute file embedding: {e}")
         
-        # 2. Fast Voting (Parallel)
-        futures = {self.thread_pool.submit(v.vote, context): v for v in self.voters}
+        return self._classify(context, start_time)
+
+    def _classify(self, context: FileContext, start_time: float) -> dict:
+        file_path = context.path
+        file_embedding = context.embedding
         
-        votes = []
-        for future in futures:
-            voter = futures[future]
-            try:
-                cat, conf = future.result()
-                if cat != "Unknown":
-                    votes.append((voter, cat, conf))
-            except Exception as e:
-                logger.error(f"Voter {voter.name} failed: {e}")
+        # 2. Fast Voting
+        votes = run_voters(context, self.voters)
 
         # 3. Arbitration
         winner, confidence, score_map = self._arbitrate(votes)
@@ -70,14 +67,23 @@ class VotingEngine:
         
         # Lowered threshold for NLI to be more active if unsure
         NLI_THRESHOLD = 0.60
+        # The processor routes by file embedding before it looks at the category, so a
+        # strong Atlas hit already fixes the destination; NLI would only relabel it
+        ATLAS_SKIP_NLI = 0.75
         
-        if (winner == "Unknown" or confidence < NLI_THRESHOLD) and context.text:
+        if winner != "Unknown" and confidence < NLI_THRESHOLD and file_embedding is not None:
+            top = atlas.find_top_k(file_embedding=file_embedding, k=1)
+            if top and top[0][1] >= ATLAS_SKIP_NLI:
+                logger.info(f"Confidence {confidence:.2f}, but Atlas matched '{top[0][0].name}' ({top[0][1]:.2f}). Skipping NLI.")
+                method = "voting_ensemble_atlas"
+        
+        if (winner == "Unknown" or confidence < NLI_THRESHOLD) and context.text and method == "voting_ensemble":
             logger.info(f"Confidence {confidence:.2f}. Using NLI fallback...")
             nli_cat, nli_conf = self.nli_voter.vote(context)
             
             if nli_cat != "Unknown":
                 # Add NLI as another voter and RE-ARBITRATE
-                votes.append((self.nli_voter, nli_cat, nli_conf))
+                votes.append((self.nli_voter.name, nli_cat, nli_conf))
                 winner, confidence, score_map = self._arbitrate(votes)
                 method = "voting_ensemble_with_nli"
 
@@ -90,15 +96,15 @@ class VotingEngine:
             "category": winner,
             "confidence": confidence,
             "method": method,
-            "keywords": list(context.metadata.keys()) + context.text.split()[:10],
+            "keywords": list(context.metadata.keys()) + context.text.split(maxsplit=10)[:10],
             "embedding": file_embedding.tolist() if file_embedding is not None else None,
             "processing_time": time.time() - start_time,
-            "votes": [{"voter": v.name, "category": c, "confidence": s} for v, c, s in votes]
+            "votes": [{"voter": name, "category": c, "confidence": s} for name, c, s in votes]
         }
         
         return result
 
-    def _arbitrate(self, votes: List[Tuple[object, str, float]]) -> Tuple[str, float, Dict]:
+    def _arbitrate(self, votes: List[Tuple[str, str, float]]) -> Tuple[str, float, Dict]:
         """
         Calculates weighted scores for all candidates.
         Score = Sum(Voter_Weight * Vote_Confidence)
@@ -106,25 +112,16 @@ class VotingEngine:
         if not votes:
             return "Unknown", 0.0, {}
             
+        # One pass: accumulate weighted scores and track the leader as we go
         scoreboard = {}
-        total_weight_participated = 0.0
-        
-        for voter, category, confidence in votes:
-            if category not in scoreboard:
-                scoreboard[category] = 0.0
-            
-            # Weighted Score
-            score = voter.weight * confidence
-            scoreboard[category] += score
-            
-            # This is a bit simplistic, but works for "Winner takes all"
-            
-        if not scoreboard:
-            return "Unknown", 0.0, {}
+        winner, raw_score = "Unknown", float("-inf")
+        weights = self._weights
+        for name, category, confidence in votes:
+            score = scoreboard.get(category, 0.0) + weights[name] * confidence
+            scoreboard[category] = score
+            if score > raw_score:
+                winner, raw_score = category, score
             
-        # Find Winner
-        winner = max(scoreboard, key=scoreboard.get)
-        raw_score = scoreboard[winner]
         final_confidence = min(raw_score, 1.0)
         return winner, final_confidence, scoreboard
 
@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog, messagebox
 import threading
+import time
 import subprocess
 import sys
 import queue
@@ -133,6 +134,8 @@ class SortifyUI:
         self.root = None
         self.paused = False
         self.log_queue = queue.Queue()
+        self.max_batch_lines = 256  # Messages inserted per _update_ui tick
+        self.max_log_lines = 5000
 
     def _on_open_logs(self):
         log_file = settings.LOG_FILE
@@ -184,16 +187,24 @@ class SortifyUI:
 
     def _update_ui(self):
         """Polls queue for UI updates on main thread."""
+        # Drain a bounded chunk and insert it in one go; the rest waits for the next tick
+        msgs = []
         try:
-            while True:
-                msg = self.log_queue.get_nowait()
-                self.txt_log.configure(state='normal')
-                self.txt_log.insert(tk.END, msg + "\n")
-                self.txt_log.see(tk.END)
-                self.txt_log.configure(state='disabled')
+            while len(msgs) < self.max_batch_lines:
+                msgs.append(self.log_queue.get_nowait())
                 self.log_queue.task_done()
         except queue.Empty:
             pass
+
+        if msgs:
+            self.txt_log.configure(state='normal')
+            self.txt_log.insert(tk.END, "\n".join(msgs) + "\n")
+            # Keep the widget bounded during long scans
+            extra = int(self.txt_log.index('end-1c').split('.')[0]) - 1 - self.max_log_lines
+            if extra > 0:
+                self.txt_log.delete('1.0', f'{extra + 1}.0')
+            self.txt_log.see(tk.END)
+            self.txt_log.configure(state='disabled')
         
         # Schedule next update
         if self.root:
@@ -204,7 +215,6 @@ class SortifyUI:
             logger.info("Running in headless mode (CLI only).")
             try:
                 while True:
-                    import time
                     time.sleep(1)
             except KeyboardInterrupt:
                 self._on_exit()
@@ -1,21 +1,42 @@
+import atexit
 import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
 from rich.logging import RichHandler
 from pathlib import Path
 
+# Background thread that owns the file handler; replaced on each setup_logger call
+_file_listener = None
+
 def setup_logger(name: str = "sortify", log_file: Path = None, level: int = logging.INFO) -> logging.Logger:
     """
     Sets up a structured logger with RichHandler for console and FileHandler for file logs.
+    Rich is only used on an interactive terminal; otherwise the console gets a plain StreamHandler.
+    File writes go through a queue so logging callers never wait on disk I/O.
     """
+    global _file_listener
     logger = logging.getLogger(name)
     logger.setLevel(level)
     
     # Remove existing handlers to avoid duplicates
     logger.handlers = []
+    if _file_listener is not None:
+        _file_listener.stop()
+        for handler in _file_listener.handlers:
+            handler.close()
+        _file_listener = None
+    # Our handlers are the only output; don't also pay for the root logger's
+    logger.propagate = False
 
-    # Console Handler (Rich)
-    console_handler = RichHandler(rich_tracebacks=True, markup=True)
+    # Console Handler: Rich markup/rendering is wasted when nobody is watching the terminal
+    if sys.stderr is not None and sys.stderr.isatty():
+        console_handler = RichHandler(rich_tracebacks=True, markup=True)
+        formatter = logging.Formatter("%(message)s", datefmt="[%X]")
+    else:
+        console_handler = logging.StreamHandler(sys.stderr)
+        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s", datefmt="%X")
     console_handler.setLevel(level)
-    formatter = logging.Formatter("%(message)s", datefmt="[%X]")
     console_handler.setFormatter(formatter)
     logger.addHandler(console_handler)
 
@@ -28,9 +49,22 @@ def setup_logger(name: str = "sortify", log_file: Path = None, level: int = logg
             "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
         )
         file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
+
+        # The logging call only enqueues; the listener thread formats and writes
+        log_queue = queue.SimpleQueue()
+        queue_handler = QueueHandler(log_queue)
+        queue_handler.setLevel(level)
+        logger.addHandler(queue_handler)
+        _file_listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        _file_listener.start()
 
     return logger
 
+def _stop_file_listener():
+    if _file_listener is not None:
+        _file_listener.stop()
+
+atexit.register(_stop_file_listener)
+
 # Default logger instance
 logger = setup_logger()
@@ -1,14 +1,21 @@
+import functools
+import time
 import psutil
 from .logger import logger
 from src.i18n.strings import Strings
 
+@functools.lru_cache(maxsize=1)
+def _read_battery(_tick: int):
+    # Keyed on the current second, so sysfs is read at most once per second
+    return psutil.sensors_battery()
+
 def check_battery_ok(threshold: int = 0) -> bool:
     """
     Checks if battery is above threshold or plugged in.
     Returns True if OK to proceed.
     """
     try:
-        battery = psutil.sensors_battery()
+        battery = _read_battery(int(time.monotonic()))
         if not battery:
             return True # No battery (Desktop)
             
@@ -29,13 +36,42 @@ from pathlib import Path
 
 def calculate_file_hash(file_path: Path) -> str:
     """Calculates SHA-256 hash of a file."""
-    sha256_hash = hashlib.sha256()
     with open(file_path, "rb") as f:
-        # Read and update hash string value in blocks of 4K
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
+        if hasattr(hashlib, "file_digest"):
+            # 3.11+: hashed in C in large blocks with the GIL released
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+        sha256_hash = hashlib.sha256()
+        # Read into one reused 1 MiB buffer instead of allocating a bytes object per block
+        buf = bytearray(1 << 20)
+        view = memoryview(buf)
+        while n := f.readinto(buf):
+            sha256_hash.update(view[:n])
     return sha256_hash.hexdigest()
 
+def next_free_version(versioned, start: int) -> int:
+    """
+    First free version at or after `start`, in O(log n) stat calls:
+    gallop (start+1, start+2, start+4, ...) to bracket it, then bisect.
+    """
+    if not versioned(start).exists():
+        return start
+
+    lo, step = start, 1  # versioned(lo) exists
+    hi = start + step
+    while versioned(hi).exists():
+        lo = hi
+        step *= 2
+        hi = start + step
+
+    while hi - lo > 1:  # versioned(hi) is free
+        mid = (lo + hi) // 2
+        if versioned(mid).exists():
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
 # -------------------------------------------------------------------------
 # Resource Guard
 # -------------------------------------------------------------------------
@@ -46,11 +82,23 @@ class ResourceGuard:
     def __init__(self, min_ram_mb=500, min_battery=20):
         self.min_ram_mb = min_ram_mb
         self.min_battery = min_battery
+        # Called before every file; battery and free RAM move on multi-second scales
+        self.cache_ttl = 1.0
+        self._last_check_ts = float("-inf")
+        self._last_result = True
 
     def check(self) -> bool:
         """
         Returns True if resources are sufficient.
         """
+        now = time.monotonic()
+        if now - self._last_check_ts < self.cache_ttl:
+            return self._last_result
+        self._last_result = self._check()
+        self._last_check_ts = now
+        return self._last_result
+
+    def _check(self) -> bool:
         # 1. Battery Check
         if not check_battery_ok(self.min_battery):
             return False